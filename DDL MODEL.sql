@@ -153,3 +153,168 @@ ALTER TABLE "materialen" ADD FOREIGN KEY ("updated_by") REFERENCES "gebruikers"
 ALTER TABLE "materialen" ADD FOREIGN KEY ("materiaal_type_id") REFERENCES "materiaal_types" ("id");
 
 ALTER TABLE "werven" ADD FOREIGN KEY ("updated_by") REFERENCES "gebruikers" ("gebruiker_id");
+
+-- Trigram indexes zodat de ILIKE '%zoekterm%' filters op de werven pagina
+-- een index scan kunnen gebruiken in plaats van een sequential scan
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_werven_naam_trgm ON "werven" USING gin ("naam" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_werven_adres_trgm ON "werven" USING gin ("adres" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_werven_type_trgm ON "werven" USING gin ("type" gin_trgm_ops);
+
+-- Unieke partial index: maximaal één actieve usage per materiaal.
+-- Ondersteunt de atomaire INSERT ... WHERE NOT EXISTS beschikbaarheidscheck
+-- in werf_materiaal_gebruiken en sluit races tussen gelijktijdige requests uit.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_materiaal_gebruik_actief ON "materiaal_gebruik" ("materiaal_id") WHERE "is_actief";
+
+-- Partial index voor de "actieve usages op deze werf" lookups
+-- (werf_verwijderen, werf_detail, werf_export_materiaal). De materiaal_id
+-- variant wordt al gedekt door ux_materiaal_gebruik_actief hierboven.
+CREATE INDEX IF NOT EXISTS ix_materiaal_gebruik_werf_actief ON "materiaal_gebruik" ("werf_id") WHERE "is_actief";
+
+-- Index voor de "materialen op deze werf" filter in werf_detail
+CREATE INDEX IF NOT EXISTS ix_materialen_werf_id ON "materialen" ("werf_id");
+
+-- Timestamps krijgen hun default in de database (now()) zodat de app-servers
+-- geen wall-clock hoeven mee te sturen en replicas geen klok-skew introduceren
+ALTER TABLE "gebruikers" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+ALTER TABLE "werven" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+ALTER TABLE "materialen" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+ALTER TABLE "materiaal_types" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+ALTER TABLE "materiaal_gebruik" ALTER COLUMN "start_tijd" SET DEFAULT now();
+ALTER TABLE "activiteiten_log" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+ALTER TABLE "keuring_status" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+ALTER TABLE "keuring_historiek" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+ALTER TABLE "documenten" ALTER COLUMN "aangemaakt_op" SET DEFAULT now();
+
+-- B-tree indexes voor de hete FK/filter-kolommen zodat lijst- en
+-- detailpagina's point lookups doen in plaats van sequential scans.
+-- (De modellen declareren dezelfde indexes via index=True/__table_args__;
+-- de database wordt extern beheerd, dus hier staat de echte DDL.)
+CREATE INDEX IF NOT EXISTS ix_materialen_keuring_id ON "materialen" ("keuring_id");
+CREATE INDEX IF NOT EXISTS ix_materialen_materiaal_type_id ON "materialen" ("materiaal_type_id");
+CREATE INDEX IF NOT EXISTS ix_materiaal_gebruik_materiaal_id ON "materiaal_gebruik" ("materiaal_id");
+CREATE INDEX IF NOT EXISTS ix_materiaal_gebruik_gebruiker_id ON "materiaal_gebruik" ("gebruiker_id");
+CREATE INDEX IF NOT EXISTS ix_activiteiten_log_gebruiker_id ON "activiteiten_log" ("gebruiker_id");
+CREATE INDEX IF NOT EXISTS ix_activiteiten_log_aangemaakt_op ON "activiteiten_log" ("aangemaakt_op");
+CREATE INDEX IF NOT EXISTS ix_activiteiten_log_serienummer_aangemaakt ON "activiteiten_log" ("serienummer", "aangemaakt_op");
+CREATE INDEX IF NOT EXISTS ix_keuring_status_serienummer ON "keuring_status" ("serienummer");
+CREATE INDEX IF NOT EXISTS ix_keuring_historiek_serienummer ON "keuring_historiek" ("serienummer");
+CREATE INDEX IF NOT EXISTS ix_keuring_historiek_materiaal_datum ON "keuring_historiek" ("materiaal_id", "keuring_datum");
+CREATE INDEX IF NOT EXISTS ix_documenten_materiaal_id ON "documenten" ("materiaal_id");
+CREATE INDEX IF NOT EXISTS ix_documenten_materiaal_type_id ON "documenten" ("materiaal_type_id");
+CREATE INDEX IF NOT EXISTS ix_documenten_gebruiker_id ON "documenten" ("gebruiker_id");
+CREATE INDEX IF NOT EXISTS ix_documenten_document_type ON "documenten" ("document_type");
+
+-- Telefoonnummers zijn geen rekenwaarden: NUMERIC decodeert client-side
+-- naar Decimal (traag te hashen/vergelijken) en kan leidende nullen of
+-- een '+'-prefix niet bewaren. Tekstkolom van 32 tekens volstaat.
+ALTER TABLE "gebruikers" ALTER COLUMN "telefoonnummer" TYPE varchar(32) USING "telefoonnummer"::varchar;
+
+-- Denormaliseer de keuringsstatus bij schrijfacties op keuring_status:
+-- een keuring die al verlopen binnenkomt (of verlopen raakt door een
+-- update van volgende_controle) zet het label direct op de materiaalrij,
+-- zodat lijstpagina's geen join naar keuring_status nodig hebben.
+-- Alleen 'goedgekeurd' mag automatisch omklappen naar 'keuring verlopen';
+-- de tijdsgedreven variant blijft MaterialService.update_expired_inspections.
+CREATE OR REPLACE FUNCTION refresh_keuring_status() RETURNS trigger AS $$
+BEGIN
+    IF NEW."serienummer" IS NOT NULL
+       AND NEW."volgende_controle" IS NOT NULL
+       AND NEW."volgende_controle" < CURRENT_DATE THEN
+        UPDATE "materialen"
+           SET "keuring_status" = 'keuring verlopen'
+         WHERE "serienummer" = NEW."serienummer"
+           AND "keuring_status" = 'goedgekeurd';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_refresh_keuring_status ON "keuring_status";
+CREATE TRIGGER trg_refresh_keuring_status
+AFTER INSERT OR UPDATE OF "volgende_controle", "serienummer" ON "keuring_status"
+FOR EACH ROW EXECUTE FUNCTION refresh_keuring_status();
+
+-- Functionele index voor case-insensitieve serienummer-lookups
+-- (find_by_serial en de duplicaatcheck in de API). Niet uniek: de
+-- bestaande unieke constraint op "serienummer" blijft de waarheid en
+-- bestaande data met afwijkend hoofdlettergebruik blijft geldig.
+CREATE INDEX IF NOT EXISTS ix_materialen_serienummer_lower ON "materialen" (lower("serienummer"));
+
+-- Partial index voor de werf-dropdowns en lijsten (filter op
+-- is_verwijderd = false, sortering op naam). De "actieve usage per
+-- materiaal" variant bestaat al als ux_materiaal_gebruik_actief.
+CREATE INDEX IF NOT EXISTS ix_werven_actief_naam ON "werven" ("naam") WHERE NOT "is_verwijderd";
+
+-- Ook de boolean-vlaggen krijgen hun default in de database, zodat
+-- Core-INSERTs (bulk paden) ze niet hoeven mee te sturen en de waarde
+-- consistent is ongeacht welke code het record aanmaakt
+ALTER TABLE "gebruikers" ALTER COLUMN "is_admin" SET DEFAULT false;
+ALTER TABLE "werven" ALTER COLUMN "is_verwijderd" SET DEFAULT false;
+ALTER TABLE "materialen" ALTER COLUMN "is_verwijderd" SET DEFAULT false;
+ALTER TABLE "materiaal_gebruik" ALTER COLUMN "is_actief" SET DEFAULT true;
+
+-- ---------------------------------------------------------------------------
+-- Optioneel: activiteiten_log partitioneren per maand (RANGE op aangemaakt_op)
+--
+-- De log groeit onbeperkt en wordt vrijwel altijd op recentheid bevraagd.
+-- Met native partitionering blijven de "hete" partities klein en kunnen oude
+-- maanden goedkoop gedetacheerd/gearchiveerd worden. Dit is een destructieve
+-- verbouwing (tabel herbouwen + data kopiëren, en de primary key moet de
+-- partitiekolom bevatten), dus BEWUST UITGECOMMENTARIEERD: alleen uitvoeren
+-- in een onderhoudsvenster, en daarna maandelijks nieuwe partities aanmaken
+-- (pg_partman of een cron met het CREATE TABLE ... PARTITION OF sjabloon).
+--
+-- BEGIN;
+-- CREATE TABLE "activiteiten_log_nieuw" (
+--     "id" bigint GENERATED BY DEFAULT AS IDENTITY,
+--     "aangemaakt_op" timestamptz DEFAULT now() NOT NULL,
+--     "actie" varchar,
+--     "naam" varchar,
+--     "serienummer" varchar,
+--     "gebruiker_naam" varchar,
+--     "gebruiker_id" bigint REFERENCES "gebruikers" ("gebruiker_id") ON DELETE SET NULL,
+--     PRIMARY KEY ("id", "aangemaakt_op")
+-- ) PARTITION BY RANGE ("aangemaakt_op");
+--
+-- -- Eén partitie per maand; sjabloon voor de maandelijkse job:
+-- CREATE TABLE "activiteiten_log_2026_08" PARTITION OF "activiteiten_log_nieuw"
+--     FOR VALUES FROM ('2026-08-01') TO ('2026-09-01');
+-- CREATE TABLE "activiteiten_log_2026_09" PARTITION OF "activiteiten_log_nieuw"
+--     FOR VALUES FROM ('2026-09-01') TO ('2026-10-01');
+-- -- Vangnet voor alle bestaande, oudere rijen:
+-- CREATE TABLE "activiteiten_log_oud" PARTITION OF "activiteiten_log_nieuw"
+--     FOR VALUES FROM (MINVALUE) TO ('2026-08-01');
+--
+-- INSERT INTO "activiteiten_log_nieuw"
+--     ("id", "aangemaakt_op", "actie", "naam", "serienummer", "gebruiker_naam", "gebruiker_id")
+--     SELECT "id", "aangemaakt_op", "actie", "naam", "serienummer", "gebruiker_naam", "gebruiker_id"
+--     FROM "activiteiten_log";
+-- SELECT setval(pg_get_serial_sequence('"activiteiten_log_nieuw"', 'id'),
+--               (SELECT COALESCE(MAX("id"), 1) FROM "activiteiten_log"));
+--
+-- ALTER TABLE "activiteiten_log" RENAME TO "activiteiten_log_backup";
+-- ALTER TABLE "activiteiten_log_nieuw" RENAME TO "activiteiten_log";
+-- CREATE INDEX ON "activiteiten_log" ("aangemaakt_op");
+-- CREATE INDEX ON "activiteiten_log" ("gebruiker_id");
+-- CREATE INDEX ON "activiteiten_log" ("serienummer", "aangemaakt_op");
+-- COMMIT;
+-- ---------------------------------------------------------------------------
+
+-- Partial index voor de materiaallijst: /materiaal filtert op
+-- niet-verwijderd (false of NULL in bestaande data) en sorteert op naam
+CREATE INDEX IF NOT EXISTS ix_materialen_actief_naam ON "materialen" ("naam")
+    WHERE ("is_verwijderd" = false OR "is_verwijderd" IS NULL);
+
+-- Trigram-indexen zodat de zoekfilters op /materiaal en /api/search
+-- (ILIKE '%...%' op naam en serienummer) een index scan worden in
+-- plaats van een volledige tabel-scan; pg_trgm is beschikbaar op Supabase
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_materialen_naam_trgm ON "materialen" USING gin ("naam" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_materialen_serienummer_trgm ON "materialen" USING gin ("serienummer" gin_trgm_ops);
+
+-- Partial index voor de "te keuren"-teller op het dashboard: de count
+-- hoeft alleen de twee statussen te raken die aandacht vragen
+CREATE INDEX IF NOT EXISTS ix_materialen_te_keuren ON "materialen" ("keuring_status")
+    WHERE "keuring_status" IN ('keuring verlopen', 'keuring gepland');
@@ -22,13 +22,41 @@ app.config.from_object(Config)
 # SQLAlchemy koppelen aan app (Supabase/Postgres)
 db.init_app(app)
 
+# Cache koppelen aan app (in-process SimpleCache)
+from cache import cache
+cache.init_app(app)
+
+# Achtergrond-executor voor niet-kritieke I/O (zoals werf-afbeelding uploads),
+# zodat de WSGI-worker niet blokkeert op storage I/O
+from concurrent.futures import ThreadPoolExecutor
+app.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload")
+
 # Supabase Storage client initialiseren
 supabase_client: Optional[Client] = None
 if SUPABASE_AVAILABLE and app.config.get("SUPABASE_URL") and app.config.get("SUPABASE_SERVICE_KEY"):
     try:
+        # Gedeelde httpx-client met keep-alive pool: zonder deze opent de SDK
+        # per call een nieuwe verbinding (TCP + TLS handshake). HTTP/2 alleen
+        # als het optionele h2-pakket aanwezig is.
+        import atexit
+        import httpx
+        from supabase.client import ClientOptions
+        try:
+            import h2  # noqa: F401
+            _http2 = True
+        except ImportError:
+            _http2 = False
+        _supabase_http = httpx.Client(
+            http2=_http2,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            timeout=30.0,
+        )
+        atexit.register(_supabase_http.close)
+
         supabase_client = create_client(
             app.config["SUPABASE_URL"],
-            app.config["SUPABASE_SERVICE_KEY"]
+            app.config["SUPABASE_SERVICE_KEY"],
+            options=ClientOptions(httpx_client=_supabase_http),
         )
         print("✓ Supabase Storage client initialized")
     except Exception as e:
@@ -41,6 +69,15 @@ else:
 from helpers import init_supabase_client
 init_supabase_client(supabase_client)
 
+# Achtergrond-flusher voor de activiteiten-log (batcht de log-INSERTs)
+from helpers import init_activity_flusher
+init_activity_flusher(app)
+
+# Mappers één keer configureren bij startup in plaats van lazy bij de
+# eerste query, zodat de eerste request per worker niet die kost draagt
+from sqlalchemy.orm import configure_mappers
+configure_mappers()
+
 # -----------------------------------------------------
 # BLUEPRINTS
 # -----------------------------------------------------
@@ -85,12 +122,35 @@ def load_current_user():
     email = session.get("user_email")
     if not email:
         return
-    g.user = Gebruiker.query.filter_by(email=email).first()
+    # PK-lookup via db.session.get (identity map / index op de primary key)
+    # in plaats van een filter op de email-kolom per request
+    user_id = session.get("user_id")
+    if user_id is None:
+        # Oude sessies van vóór session["user_id"]: email->id via een korte
+        # TTL-cache (zie helpers.resolve_user_id_by_email), daarna staat het
+        # id in de sessie
+        from helpers import resolve_user_id_by_email
+        user_id = resolve_user_id_by_email(email)
+        if user_id is None:
+            return
+        session["user_id"] = user_id
+    g.user = db.session.get(Gebruiker, user_id)
 
 
 # Document types initialization removed - document_type is now stored as string in Document model
 
 
+@app.after_request
+def wait_for_pending_uploads(response):
+    # Uploads naar Supabase draaien op een achtergrond-pool (zie helpers.py).
+    # Standaard wachten we er niet op; met WAIT_FOR_UPLOADS=True blokkeert de
+    # response tot alle uploads van deze request klaar zijn
+    if app.config.get("WAIT_FOR_UPLOADS"):
+        for future in g.pop("pending_uploads", []):
+            future.result()
+    return response
+
+
 @app.context_processor
 def inject_user():
     # in templates beschikbaar als {{ current_user }}
@@ -146,6 +206,10 @@ app.config["PROJECT_UPLOAD_FOLDER"] = PROJECT_UPLOAD_FOLDER
 app.config["CERTIFICATE_UPLOAD_FOLDER"] = CERTIFICATE_UPLOAD_FOLDER
 app.config["TYPE_IMAGE_UPLOAD_FOLDER"] = TYPE_IMAGE_UPLOAD_FOLDER
 
+# Dispatch-tabellen voor uploads één keer opbouwen uit de config
+from helpers import init_upload_dispatch
+init_upload_dispatch(app)
+
 # Upload helper functions are in helpers.py
 
 
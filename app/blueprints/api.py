@@ -5,8 +5,11 @@ from flask import Blueprint, request, jsonify, g
 from models import db, Material, MaterialUsage, Keuringstatus, KeuringHistoriek, Document
 from helpers import login_required, get_file_url_from_path, get_document_url
 from sqlalchemy import or_, func
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, undefer
 from datetime import datetime
+import logging
+
+_log = logging.getLogger(__name__)
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -27,9 +30,15 @@ def api_search():
         like = f"%{q}%"
         
         # Optimized query - eager load material_type to get inspection_validity_days
+        # undefer: de JSON bevat note en documentation_path, die standaard
+        # deferred zijn voor de lijstqueries
         items = (
             Material.query
-            .options(joinedload(Material.material_type))
+            .options(
+                joinedload(Material.material_type),
+                undefer(Material.note),
+                undefer(Material.documentation_path),
+            )
             .filter(or_(Material.name.ilike(like), Material.serial.ilike(like)))
             .limit(10)
             .all()
@@ -62,7 +71,7 @@ def api_search():
                 # Convert to dictionary for O(1) lookup
                 usage_count_map = {row[0]: row[1] for row in active_usage_counts if row and row[0]}
             except Exception as usage_query_error:
-                print(f"Warning: Could not query material usage: {usage_query_error}")
+                _log.warning("Could not query material usage: %s", usage_query_error)
                 usage_count_map = {}
         
         # Query all documents for these materials in one query
@@ -82,7 +91,7 @@ def api_search():
                             documents_by_material[doc.material_id] = []
                         documents_by_material[doc.material_id].append(doc)
             except Exception as doc_query_error:
-                print(f"Warning: Could not query documents: {doc_query_error}")
+                _log.warning("Could not query documents: %s", doc_query_error)
                 documents_by_material = {}
         
         # Query all keuring historiek for these materials in one query
@@ -103,7 +112,7 @@ def api_search():
                             keuring_historiek_by_material[hist.material_id] = []
                         keuring_historiek_by_material[hist.material_id].append(hist)
             except Exception as historiek_query_error:
-                print(f"Warning: Could not query keuring historiek: {historiek_query_error}")
+                _log.warning("Could not query keuring historiek: %s", historiek_query_error)
                 keuring_historiek_by_material = {}
         
         # Also query keuring by serienummer for materials that don't have keuring_id
@@ -121,7 +130,7 @@ def api_search():
                     if k and k.serienummer
                 }
             except Exception as keuring_query_error:
-                print(f"Warning: Could not query keuring by serial: {keuring_query_error}")
+                _log.warning("Could not query keuring by serial: %s", keuring_query_error)
                 keuring_by_serial = {}
         
         results = []
@@ -143,7 +152,7 @@ def api_search():
                         keuring_info = keuring_by_serial[item.serial]
                 except Exception as keuring_error:
                     # If accessing relationship fails, fallback to serial lookup
-                    print(f"Warning: Could not access keuring relationship for {item.serial}: {keuring_error}")
+                    _log.warning("Could not access keuring relationship for %s: %s", item.serial, keuring_error)
                     if item.serial and item.serial in keuring_by_serial:
                         keuring_info = keuring_by_serial[item.serial]
                 
@@ -170,10 +179,8 @@ def api_search():
                         # Gebruik centrale helper functie voor document URLs
                         # Default bucket voor legacy documentation_path is "Aankoop-Verkoop documenten"
                         documentation_url = get_document_url("Aankoopfactuur", item.documentation_path) or ""
-                except Exception as doc_url_error:
-                    print(f"Warning: Could not generate documentation URL for {item.serial}: {doc_url_error}")
-                    import traceback
-                    traceback.print_exc()
+                except Exception:
+                    _log.exception("Could not generate documentation URL for %s", item.serial)
                     documentation_url = ""
                 
                 # Haal veiligheidsfiche op op basis van material_type_id
@@ -195,7 +202,7 @@ def api_search():
                             safety_sheet_url = get_document_url("Veiligheidsfiche", safety_doc.file_path) or ""
                 except (ImportError, AttributeError, ProgrammingError) as safety_error:
                     # Document tabel bestaat niet of is niet beschikbaar
-                    print(f"Warning: Could not get safety sheet for {item.serial}: {safety_error}")
+                    _log.warning("Could not get safety sheet for %s: %s", item.serial, safety_error)
                     safety_sheet_path = None
                     safety_sheet_url = None
                 
@@ -208,10 +215,8 @@ def api_search():
                         if doc.file_path:
                             # Gebruik centrale helper functie voor document URLs
                             doc_url = get_document_url(doc.document_type, doc.file_path) or ""
-                    except Exception as doc_url_error:
-                        print(f"Warning: Could not generate document URL: {doc_url_error}")
-                        import traceback
-                        traceback.print_exc()
+                    except Exception:
+                        _log.exception("Could not generate document URL")
                         doc_url = ""
                     
                     documents_list.append({
@@ -229,7 +234,7 @@ def api_search():
                     if item.purchase_date:
                         purchase_date_str = item.purchase_date.strftime("%Y-%m-%d")
                 except (AttributeError, ValueError, TypeError) as date_error:
-                    print(f"Warning: Could not format purchase_date for {item.serial}: {date_error}")
+                    _log.warning("Could not format purchase_date for %s: %s", item.serial, date_error)
                     purchase_date_str = ""
                 
                 # Format laatste_keuring from material (not from keuring_info)
@@ -240,7 +245,7 @@ def api_search():
                     if inspection_date:
                         laatste_keuring_material_str = inspection_date.strftime("%Y-%m-%d")
                 except (AttributeError, ValueError, TypeError) as date_error:
-                    print(f"Warning: Could not format laatste_keuring for {item.serial}: {date_error}")
+                    _log.warning("Could not format laatste_keuring for %s: %s", item.serial, date_error)
                     laatste_keuring_material_str = None
                 
                 # Format raw laatste_keuring value (without fallback) for editing purposes
@@ -249,7 +254,7 @@ def api_search():
                     if item.laatste_keuring:
                         laatste_keuring_raw_str = item.laatste_keuring.strftime("%Y-%m-%d")
                 except (AttributeError, ValueError, TypeError) as date_error:
-                    print(f"Warning: Could not format raw laatste_keuring for {item.serial}: {date_error}")
+                    _log.warning("Could not format raw laatste_keuring for %s: %s", item.serial, date_error)
                     laatste_keuring_raw_str = None
                 
                 # Get inspection_validity_days from material_type
@@ -258,7 +263,7 @@ def api_search():
                     if item.material_type_id and item.material_type:
                         inspection_validity_days = item.material_type.inspection_validity_days
                 except Exception as type_error:
-                    print(f"Warning: Could not get inspection_validity_days for {item.serial}: {type_error}")
+                    _log.warning("Could not get inspection_validity_days for %s: %s", item.serial, type_error)
                     inspection_validity_days = None
                 
                 # Get keuring historiek for this material
@@ -277,7 +282,7 @@ def api_search():
                             "certificaat_url": get_document_url("Keuringstatus", hist.certificaat_path) if hist.certificaat_path else None,
                         })
                 except Exception as historiek_error:
-                    print(f"Warning: Could not format keuring historiek for {item.serial}: {historiek_error}")
+                    _log.warning("Could not format keuring historiek for %s: %s", item.serial, historiek_error)
                     keuring_historiek_list = []
                 
                 results.append(
@@ -308,18 +313,21 @@ def api_search():
                     "keuringen": keuring_historiek_list,  # List of keuring historiek records
                     }
                 )
-            except Exception as e:
+            except Exception:
                 # Log error for this item but continue with other items
-                print(f"Error processing material {item.serial if item else 'unknown'}: {e}")
+                _log.exception("Error processing material %s", item.serial if item else "unknown")
                 continue
         
-        return jsonify({"items": results}), 200
+        resp = jsonify({"items": results})
+        # HTTP-laag caching: via een ETag kan de browser bij een herhaalde
+        # zoekopdracht (If-None-Match) een lege 304 krijgen in plaats van de
+        # volledige JSON-payload opnieuw te downloaden
+        resp.cache_control.private = True
+        resp.add_etag()
+        return resp.make_conditional(request)
     except Exception as e:
         # Log the error and return a proper error response
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error in api_search: {e}")
-        print(f"Traceback: {error_details}")
+        _log.exception("Error in api_search")
         
         # Return a user-friendly error message
         error_message = f"Er is een fout opgetreden bij het zoeken: {str(e)}"
@@ -349,8 +357,11 @@ def api_material_update(material_id):
         if "serial" in data:
             new_serial = data["serial"].strip()
             if new_serial and new_serial != material.serial:
-                # Check if serial already exists
-                existing = Material.query.filter_by(serial=new_serial).first()
+                # Check if serial already exists (case-insensitief, via de
+                # functionele index op lower(serienummer))
+                existing = Material.query.filter(
+                    func.lower(Material.serial) == new_serial.lower()
+                ).first()
                 if existing and existing.id != material_id:
                     return jsonify({"error": "Serienummer bestaat al"}), 400
                 material.serial = new_serial
@@ -392,10 +403,7 @@ def api_material_update(material_id):
         
     except Exception as e:
         db.session.rollback()
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error in api_material_update: {e}")
-        print(f"Traceback: {error_details}")
+        _log.exception("Error in api_material_update")
         return jsonify({
             "error": f"Fout bij bijwerken: {str(e)}"
         }), 500
@@ -432,7 +440,7 @@ def api_material_delete(material_id):
         except Exception as cascade_error:
             # If cascade delete fails, manually delete dependent records
             db.session.rollback()
-            print(f"Cascade delete failed, trying manual delete: {cascade_error}")
+            _log.warning("Cascade delete failed, trying manual delete: %s", cascade_error)
             
             try:
                 # Delete dependent records manually
@@ -459,7 +467,7 @@ def api_material_delete(material_id):
                 
             except Exception as manual_error:
                 db.session.rollback()
-                print(f"Manual delete also failed: {manual_error}")
+                _log.error("Manual delete also failed: %s", manual_error)
                 return jsonify({
                     "error": f"Fout bij verwijderen: {str(manual_error)}"
                 }), 500
@@ -475,10 +483,7 @@ def api_material_delete(material_id):
         
     except Exception as e:
         db.session.rollback()
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error in api_material_delete: {e}")
-        print(f"Traceback: {error_details}")
+        _log.exception("Error in api_material_delete")
         return jsonify({
             "error": f"Fout bij verwijderen: {str(e)}"
         }), 500
\ No newline at end of file
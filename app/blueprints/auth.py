@@ -4,7 +4,7 @@ Authentication blueprint - handles login, signup, logout
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models import db, Gebruiker
 from werkzeug.security import generate_password_hash, check_password_hash
-from helpers import login_required
+from helpers import login_required, invalidate_user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -38,6 +38,7 @@ def signup():
         db.session.commit()
 
         session["user_email"] = email
+        session["user_id"] = new_user.gebruiker_id
         flash("Account aangemaakt en ingelogd.", "success")
         return redirect(url_for("dashboard.dashboard"))
 
@@ -66,6 +67,7 @@ def login():
             return render_template("auth_login.html", prefill_email=email)
 
         session["user_email"] = email
+        session["user_id"] = user.gebruiker_id
         flash("Je bent ingelogd.", "success")
         next_url = request.args.get("next")
         return redirect(next_url or url_for("dashboard.dashboard"))
@@ -76,6 +78,7 @@ def login():
 
 @auth_bp.route("/logout")
 def logout():
+    invalidate_user_cache(session.get("user_email"))
     session.clear()
     flash("Je bent uitgelogd.", "info")
     return redirect(url_for("auth.login"))
@@ -9,6 +9,7 @@ from sqlalchemy import or_, func
 from helpers import login_required, save_upload_to_supabase, get_file_url_from_path, get_supabase_file_url, get_document_url, log_activity_db, delete_file_from_supabase
 from constants import DOCUMENT_TYPES
 from models import db, Document, Material, MaterialType, KeuringHistoriek
+from blueprints.materiaal import _material_type_options
 from datetime import timedelta
 
 
@@ -169,11 +170,12 @@ def documenten():
     # Combineer types uit materialen en uit bestaande veiligheidsfiches
     material_types_set = set()
     
-    # Haal types uit MaterialType tabel
-    material_types_from_db = MaterialType.query.all()
-    for mt in material_types_from_db:
-        if mt.name:
-            material_types_set.add(mt.name)
+    # Haal types uit MaterialType tabel via de gememoizede referentielijst
+    # (zelfde cache als de dropdowns op /materiaal; de types-routes
+    # invalideren die bij wijzigingen)
+    for type_option in _material_type_options():
+        if type_option.name:
+            material_types_set.add(type_option.name)
     
     # Haal ook types uit documenten tabel (uit bestaande veiligheidsfiches)
     material_types_from_docs = db.session.query(Document.material_type).filter(
@@ -1,13 +1,12 @@
 """
 Geschiedenis blueprint - handles activity history routes
 """
-from flask import Blueprint, render_template, request, Response
+from flask import Blueprint, render_template, request, Response, stream_with_context
 from models import Activity
 from helpers import login_required
 from services import ActivityService
 from datetime import datetime
 import csv
-from io import StringIO
 
 geschiedenis_bp = Blueprint('geschiedenis', __name__)
 
@@ -51,54 +50,52 @@ def geschiedenis():
     )
 
 
+class _Echo:
+    """Pseudo-buffer voor csv.writer: geeft de geschreven rij direct terug zodat
+    we die kunnen yielden in plaats van alles in een StringIO te bufferen."""
+
+    def write(self, value):
+        return value
+
+
 @geschiedenis_bp.route("/geschiedenis/export")
 @login_required
 def geschiedenis_export():
-    """Export geschiedenis naar CSV"""
-    import csv
-    from io import StringIO
-    from datetime import timedelta
-    
+    """Export geschiedenis naar CSV (streaming)"""
     # Haal filter parameters op (zelfde als geschiedenis route)
     filter_type = request.args.get("type", "all")
     filter_user = request.args.get("user", "")
     filter_period = request.args.get("period", "all")
     search_q = request.args.get("q", "").strip().lower()
-    
-    # Use service layer for activity filtering (ORM-based)
-    # For export, we want all matching activities, so use a high limit
-    activities, _ = ActivityService.get_activities_filtered(
-        filter_type=filter_type,
-        filter_user=filter_user,
-        filter_period=filter_period,
-        search_q=search_q,
-        limit=10000  # High limit for export
-    )
-    
-    # Maak CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Headers
-    writer.writerow(['Datum', 'Tijd', 'Actie', 'Materiaal', 'Serienummer', 'Gebruiker'])
-    
-    # Data
-    for act in activities:
-        writer.writerow([
-            act.created_at.strftime('%Y-%m-%d') if act.created_at else '',
-            act.created_at.strftime('%H:%M:%S') if act.created_at else '',
-            act.action or '',
-            act.name or '',
-            act.serial or '',
-            act.user_name or '',
-        ])
-    
-    # Maak response
-    output.seek(0)
+
+    def generate():
+        # Stream rij per rij via een server-side cursor: geen 10.000-rijen
+        # limiet en geen volledige resultatenset in het geheugen; de eerste
+        # bytes vertrekken meteen naar de client
+        writer = csv.writer(_Echo())
+
+        yield writer.writerow(['Datum', 'Tijd', 'Actie', 'Materiaal', 'Serienummer', 'Gebruiker'])
+
+        rows = ActivityService.iter_export_rows(
+            filter_type=filter_type,
+            filter_user=filter_user,
+            filter_period=filter_period,
+            search_q=search_q,
+        )
+        for aangemaakt_op, action, name, serial, user_name in rows:
+            yield writer.writerow([
+                aangemaakt_op.strftime('%Y-%m-%d') if aangemaakt_op else '',
+                aangemaakt_op.strftime('%H:%M:%S') if aangemaakt_op else '',
+                action or '',
+                name or '',
+                serial or '',
+                user_name or '',
+            ])
+
     filename = f"geschiedenis_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-    
+
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
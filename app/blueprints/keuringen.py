@@ -522,7 +522,7 @@ def api_keuring_details(historiek_id):
         "volgende_keuring_datum": historiek.volgende_keuring_datum.strftime("%Y-%m-%d") if historiek.volgende_keuring_datum else "-",
         "certificaat_path": historiek.certificaat_path or None,
         "certificaat_url": get_document_url("Keuringstatus", historiek.certificaat_path) if historiek.certificaat_path else None,
-        "created_at": historiek.created_at.strftime("%Y-%m-%d %H:%M") if historiek.created_at else "-",
+        "created_at": historiek.aangemaakt_op.strftime("%Y-%m-%d %H:%M") if historiek.aangemaakt_op else "-",
     })
 
 
@@ -3,19 +3,45 @@ Materiaal blueprint - handles all material-related routes
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, g, current_app
 from models import db, Material, MaterialUsage, Project, MaterialType, Activity, Keuringstatus, Document
-from helpers import login_required, log_activity_db, save_upload, save_upload_to_supabase
+from helpers import login_required, log_activity_db, save_upload, save_upload_to_supabase, delete_file_from_supabase
 from services import MaterialService, MaterialUsageService, ensure_keuring_status_and_historiek_for_new_material
 from constants import DEFAULT_INSPECTION_STATUS, DOCUMENT_TYPES
+from cache import cache
 from datetime import datetime
 from sqlalchemy import or_, func, case, text, and_
+from sqlalchemy.orm import lazyload, raiseload
 from werkzeug.utils import secure_filename
+from collections import namedtuple
+import logging
 import os
 
+_log = logging.getLogger(__name__)
+
 materiaal_bp = Blueprint('materiaal', __name__, url_prefix='/materiaal')
 
 # NOTE: update_verlopen_keuringen() moved to MaterialService.update_expired_inspections()
 
 
+# Slank, picklebaar alternatief voor volledige MaterialType ORM-objecten
+# in de cache; de templates gebruiken alleen .id en .name
+_TypeOption = namedtuple("_TypeOption", ["id", "name"])
+
+
+@cache.memoize(timeout=300)
+def _material_type_options() -> list:
+    """
+    Slanke (id, naam) lijst voor de type-dropdowns in de modals.
+    Gememoized: materiaal_types is een kleine referentietabel die alleen
+    wijzigt via de types-routes hieronder - die invalideren expliciet.
+    """
+    rows = (
+        db.session.query(MaterialType.id, MaterialType.name)
+        .order_by(MaterialType.name.asc())
+        .all()
+    )
+    return [_TypeOption(type_id, name) for type_id, name in rows]
+
+
 @materiaal_bp.route("", methods=["GET"])
 @login_required
 def materiaal():
@@ -27,7 +53,14 @@ def materiaal():
     type_filter = (request.args.get("type") or "").strip().lower()
     status = (request.args.get("status") or "").strip().lower()
 
-    query = Material.query.filter(
+    # De lijst-template leest alleen kolommen (naam, serienummer, type,
+    # status); relaties en documenten komen via de JSON-API binnen. In
+    # debug/test maakt raiseload een onbedoelde relatie-access in de
+    # template een luide fout; in productie schakelt lazyload alleen de
+    # (hier ongebruikte) selectin-batchqueries uit
+    relatie_guard = raiseload("*") if (current_app.debug or current_app.testing) else lazyload("*")
+
+    query = Material.query.options(relatie_guard).filter(
         or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None))
     )
 
@@ -56,9 +89,14 @@ def materiaal():
         .scalar()
     ) or 0
 
-    all_materials = Material.query.filter(
-        or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None))
-    ).all()
+    # Alleen id en naam nodig voor de naam-datalist: slanke kolom-query
+    # in plaats van volledige rijen (incl. brede Text-kolommen en de
+    # selectin-relaties) voor elk materiaal
+    all_materials = (
+        db.session.query(Material.id, Material.name)
+        .filter(or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None)))
+        .all()
+    )
     
     active_usages = (
         db.session.query(MaterialUsage, Material)
@@ -73,7 +111,7 @@ def materiaal():
     other_usages = []
     usages_without_project = []
     
-    current_user_name = g.user.Naam if getattr(g, "user", None) else None
+    current_user_name = g.user.naam if getattr(g, "user", None) else None
 
     for usage, material in active_usages:
         row = {
@@ -128,15 +166,18 @@ def materiaal():
     )
     types_list = [t[0] for t in unique_types if t[0]]
     
-    # Get all Material Types for the dropdown in modals
-    all_material_types = MaterialType.query.order_by(MaterialType.name.asc()).all()
+    # Get all Material Types for the dropdown in modals (gememoized)
+    all_material_types = _material_type_options()
     
     # Werven voor de dropdown in "Gebruik Materieel"
     from models import Project
     from datetime import datetime
     today = datetime.utcnow().date()
+    # De dropdowns gebruiken alleen id, naam en startdatum: lichte rijen
+    # in plaats van volledige Project-objecten
     projects = (
-        Project.query.filter_by(is_deleted=False)
+        db.session.query(Project.id, Project.name, Project.start_date)
+        .filter(Project.is_deleted.is_(False))
         .order_by(Project.start_date.asc())
         .all()
     )
@@ -291,7 +332,8 @@ def materiaal_type_toevoegen():
             db.session.add(document)
     
     db.session.commit()
-    
+    cache.delete_memoized(_material_type_options)
+
     log_activity_db("materiaal type toegevoegd", name, "")
     flash(f"Type '{name}' is toegevoegd.", "success")
     return redirect(url_for("materiaal.materiaal_types"))
@@ -312,7 +354,7 @@ def materiaal_type_bewerken():
         flash("Type ID ontbreekt.", "danger")
         return redirect(url_for("materiaal.materiaal_types"))
     
-    type_item = MaterialType.query.get(type_id)
+    type_item = db.session.get(MaterialType, type_id)
     if not type_item:
         flash("Type niet gevonden.", "danger")
         return redirect(url_for("materiaal.materiaal_types"))
@@ -425,7 +467,8 @@ def materiaal_type_bewerken():
     type_item.inspection_validity_days = inspection_validity_days
     
     db.session.commit()
-    
+    cache.delete_memoized(_material_type_options)
+
     log_activity_db("materiaal type bewerkt", f"{old_name} -> {name}", "")
     flash(f"Type '{name}' is bijgewerkt.", "success")
     return redirect(url_for("materiaal.materiaal_types"))
@@ -441,7 +484,7 @@ def materiaal_type_verwijderen():
         flash("Type ID ontbreekt.", "danger")
         return redirect(url_for("materiaal.materiaal_types"))
     
-    type_item = MaterialType.query.get(type_id)
+    type_item = db.session.get(MaterialType, type_id)
     if not type_item:
         flash("Type niet gevonden.", "danger")
         return redirect(url_for("materiaal.materiaal_types"))
@@ -496,6 +539,7 @@ def materiaal_type_verwijderen():
             flash(f"Fout bij verwijderen type: {str(e2)}", "danger")
             return redirect(url_for("materiaal.materiaal_types"))
     
+    cache.delete_memoized(_material_type_options)
     log_activity_db("materiaal type verwijderd", type_name, "")
     flash(f"Type '{type_name}' is verwijderd.", "success")
     return redirect(url_for("materiaal.materiaal_types"))
@@ -802,10 +846,10 @@ def materiaal_bewerken():
     if new_project_id:
         project = Project.query.filter_by(id=new_project_id, is_deleted=False).first()
         if project:
-            item.project_id = new_project_id
+            item.werf_id = new_project_id
             item.site = project.name
     else:
-        item.project_id = None
+        item.werf_id = None
         item.site = None
     
     # Get keuring_status from form (NIET "status" - dat is gebruiksstatus!)
@@ -926,7 +970,7 @@ def materiaal_verwijderen():
         # Verwijder gekoppelde Keuringstatus record (hard delete)
         # Dit zorgt ervoor dat het materiaal niet meer verschijnt in keuringentabel
         if item.keuring_id:
-            keuring_status = Keuringstatus.query.get(item.keuring_id)
+            keuring_status = db.session.get(Keuringstatus, item.keuring_id)
             if keuring_status:
                 # Check of er andere materialen zijn die deze keuring_status gebruiken
                 # Als dit het enige materiaal is, verwijder de keuring_status
@@ -981,14 +1025,32 @@ def materiaal_document_verwijderen():
         return redirect(url_for("materiaal.materiaal"))
     
     # Verwijder fysiek bestand als het bestaat
+    # Nieuwe uploads staan in Supabase Storage; alleen legacy paden ("uploads/...")
+    # staan nog lokaal in de static folder. Sla de lokale os.remove dus over voor
+    # Supabase paden en ruim daar het object in de bucket op (voorkomt orphans).
     if file_path:
-        full_path = os.path.join(current_app.root_path, "static", file_path)
-        if os.path.exists(full_path):
-            try:
-                os.remove(full_path)
-            except OSError as e:
-                # Log error maar ga door met database update
-                print(f"Fout bij verwijderen bestand {full_path}: {e}")
+        if file_path.startswith("uploads/"):
+            full_path = os.path.join(current_app.root_path, "static", file_path)
+            if os.path.exists(full_path):
+                try:
+                    os.remove(full_path)
+                except OSError as e:
+                    # Log error maar ga door met database update
+                    _log.warning("Fout bij verwijderen bestand %s: %s", full_path, e)
+        else:
+            # documentation_path kan naar elk document type wijzen (zie
+            # materiaal_bewerken); bepaal de bucket via het Document record
+            # in plaats van er één aan te nemen, anders blijft het object
+            # in de andere buckets als orphan staan
+            bucket_mapping = {
+                "Aankoopfactuur": "Aankoop-Verkoop documenten",
+                "Verkoopfactuur": "Aankoop-Verkoop documenten",
+                "Keuringstatus": "Keuringsstatus",
+                "Veiligheidsfiche": "Veiligheidsfiche"
+            }
+            doc_row = Document.query.filter_by(material_id=item.id, file_path=file_path).first()
+            bucket = bucket_mapping.get(doc_row.document_type, "Aankoop-Verkoop documenten") if doc_row else "Aankoop-Verkoop documenten"
+            delete_file_from_supabase(bucket, file_path)
     
     # Verwijder pad uit database
     setattr(item, field_name, None)
@@ -1028,12 +1090,16 @@ def materiaal_gebruiken():
         flash("Materiaal al in gebruik.", "danger")
         return redirect(url_for("materiaal.materiaal"))
 
-    if not assigned_to and getattr(g, "user", None):
-        assigned_to = g.user.Naam or ""
+    # Cache g.user één keer: elke getattr op g gaat via de LocalProxy/app-context stack
+    user = getattr(g, "user", None)
+    user_name = user.naam or "" if user else ""
+
+    if not assigned_to:
+        assigned_to = user_name
 
     # Use service to start usage
     try:
-        user_id = g.user.gebruiker_id
+        user_id = user.gebruiker_id
         # Get project if project_id provided
         project_obj = None
         if project_id:
@@ -1042,7 +1108,7 @@ def materiaal_gebruiken():
         MaterialUsageService.start_usage(
             material=item,
             user_id=user_id,
-            used_by=assigned_to or (g.user.Naam if getattr(g, "user", None) else ""),
+            used_by=assigned_to or user_name,
             project_id=project_id,
             site=site_value
         )
@@ -1066,8 +1132,10 @@ def materiaal_stop_gebruik():
         flash("Geen gebruiksessie gevonden.", "danger")
         return redirect(url_for("materiaal.materiaal"))
 
-    current_user_name = g.user.Naam if getattr(g, "user", None) else ""
-    is_admin = getattr(g.user, 'is_admin', False) if getattr(g, "user", None) else False
+    # Cache g.user één keer in plaats van meerdere proxy resolutions
+    user = getattr(g, "user", None)
+    current_user_name = user.naam if user else ""
+    is_admin = getattr(user, 'is_admin', False) if user else False
 
     # Use service to stop usage
     try:
@@ -1,36 +1,107 @@
 """
 Werven blueprint - handles all project/werf-related routes
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, g, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response, g, current_app, stream_with_context
 from models import db, Material, MaterialUsage, Project
-from helpers import login_required, log_activity_db, save_project_image, get_file_url_from_path
+from helpers import login_required, log_activity_db, log_activities_bulk, save_project_image, get_file_url_from_path
+from cache import cache
 from services import MaterialService
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional
-from sqlalchemy import or_
+from sqlalchemy import or_, func, insert, update, select, exists, literal, case, null
+import logging
+import re
 import csv
-from io import StringIO
+from io import BytesIO
+from werkzeug.datastructures import FileStorage
 
 werven_bp = Blueprint('werven', __name__)
 
+# Ongeldige karakters in export-bestandsnamen (gecompileerd op module-niveau)
+_FILENAME_RE = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def _form_str(form, key):
+    """Formulierveld als gestripte string; geen allocatie op het None-pad."""
+    value = form.get(key)
+    return value.strip() if value else ""
+
 
 def find_material_by_name_or_number(name: str, nummer: Optional[str]):
     """Find material by name or number"""
     return MaterialService.find_by_name_or_number(name, nummer)
 
 
+@cache.memoize(timeout=300)
+def _autocomplete_projects() -> list[tuple]:
+    """
+    Slanke (naam, adres) lijst voor de zoek-datalist op de werven pagina.
+    Gememoized: de lijst verandert alleen wanneer werven worden toegevoegd,
+    bewerkt of verwijderd - die routes invalideren de cache expliciet.
+    """
+    rows = (
+        db.session.query(Project.name, Project.address)
+        .filter(Project.is_deleted.is_(False))
+        .order_by(Project.name)
+        .all()
+    )
+    return [(name, address) for name, address in rows]
+
+
+def _upload_project_image_async(app, project_id, data, filename, content_type, prefix):
+    """
+    Upload een werf-afbeelding buiten de request-thread en schrijf het pad
+    daarna in een eigen sessie weg. De bytes zijn al tijdens de request
+    gelezen, want een FileStorage is na de request niet meer bruikbaar.
+    """
+    with app.app_context():
+        try:
+            file_storage = FileStorage(
+                stream=BytesIO(data), filename=filename, content_type=content_type
+            )
+            image_path = save_project_image(file_storage, prefix)
+            if image_path:
+                db.session.query(Project).filter_by(id=project_id).update(
+                    {"image_url": image_path}
+                )
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(
+                "Achtergrond-upload van werf-afbeelding mislukt (werf %s): %s",
+                project_id, e
+            )
+        finally:
+            db.session.remove()
+
+
+def _submit_project_image_upload(project_id, data, filename, content_type, prefix):
+    """Zet de afbeelding-upload op de achtergrond-executor van de app."""
+    current_app.executor.submit(
+        _upload_project_image_async,
+        current_app._get_current_object(),
+        project_id,
+        data,
+        filename,
+        content_type,
+        prefix,
+    )
+
+
 @werven_bp.route("/werven")
 @login_required
 def werven():
     today = datetime.utcnow().date()
     search_q = (request.args.get("q") or "").strip().lower()
-    
-    # Alle werven voor autocomplete suggesties
-    all_projects = Project.query.filter_by(is_deleted=False).order_by(Project.name).all()
-    
+
+    # Alle werven voor autocomplete suggesties (gecached, alleen naam + adres)
+    all_projects = _autocomplete_projects()
+
     query = Project.query.filter_by(is_deleted=False)
     
     # Filter op zoekterm
+    # De ILIKE '%q%' predicaten worden gedekt door pg_trgm GIN indexes
+    # (zie DDL MODEL.sql), zodat Postgres een index scan kan gebruiken
     if search_q:
         query = query.filter(
             or_(
@@ -49,12 +120,12 @@ def werven():
 def werf_toevoegen():
     f = request.form
 
-    name = (f.get("name") or "").strip()
-    type_ = (f.get("type") or "").strip()
-    address = (f.get("address") or "").strip()
-    start_date_str = (f.get("start_date") or "").strip()
-    end_date_str = (f.get("end_date") or "").strip()
-    note = (f.get("note") or "").strip()
+    name = _form_str(f, "name")
+    type_ = _form_str(f, "type")
+    address = _form_str(f, "address")
+    start_date_str = _form_str(f, "start_date")
+    end_date_str = _form_str(f, "end_date")
+    note = _form_str(f, "note")
 
     image_file = request.files.get("image_file")
 
@@ -65,19 +136,28 @@ def werf_toevoegen():
     start_date = None
     end_date = None
     try:
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        start_date = date.fromisoformat(start_date_str)
     except ValueError:
         flash("Ongeldige startdatum.", "danger")
         return redirect(url_for("werven.werven"))
 
     if end_date_str:
         try:
-            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+            end_date = date.fromisoformat(end_date_str)
         except ValueError:
             flash("Ongeldige einddatum.", "danger")
             return redirect(url_for("werven.werven"))
 
-    image_path = save_project_image(image_file, name.replace(" ", "_")) if image_file else None
+    # Upload in de achtergrond: lees de bytes nu, sla de werf meteen op en
+    # laat de executor het pad naderhand wegschrijven. Zo blokkeert de
+    # request niet op storage I/O.
+    image_path = None
+    image_payload = None
+    if image_file and image_file.filename:
+        if current_app.config.get("ASYNC_IMAGE_UPLOADS", True):
+            image_payload = (image_file.read(), image_file.filename, image_file.content_type)
+        else:
+            image_path = save_project_image(image_file, name.replace(" ", "_"))
 
     project = Project(
         name=name,
@@ -88,11 +168,17 @@ def werf_toevoegen():
         image_url=image_path,
         note=note or None,
         is_deleted=False,
-        created_at=datetime.utcnow(),
     )
 
     db.session.add(project)
     db.session.commit()
+    cache.delete_memoized(_autocomplete_projects)
+
+    if image_payload:
+        data, filename, content_type = image_payload
+        _submit_project_image_upload(
+            project.id, data, filename, content_type, name.replace(" ", "_")
+        )
 
     flash("Nieuwe werf toegevoegd.", "success")
     return redirect(url_for("werven.werven"))
@@ -106,7 +192,7 @@ def werf_verwijderen():
         flash("Geen toegang tot deze functie. Alleen admins kunnen werven verwijderen.", "danger")
         return redirect(url_for("werven.werven"))
 
-    project_id = (request.form.get("project_id") or "").strip()
+    project_id = _form_str(request.form, "project_id")
     if not project_id:
         flash("Geen werf geselecteerd.", "danger")
         return redirect(url_for("werven.werven"))
@@ -119,59 +205,90 @@ def werf_verwijderen():
     project_id_int = int(project_id)
     project_name = project.name or f"Werf {project_id_int}"
 
-    # 1. Stop alle actieve MaterialUsage records die aan deze werf gekoppeld zijn
-    active_usages = MaterialUsage.query.filter_by(
-        project_id=project_id_int,
-        is_active=True
-    ).all()
-    
-    materials_to_update = set()
-    
-    for usage in active_usages:
-        usage.is_active = False
-        usage.end_time = datetime.utcnow()
-        usage.project_id = None  # project_id is alias voor werf_id
-        materials_to_update.add(usage.material_id)
-        
-        # Log activiteit
-        mat = Material.query.get(usage.material_id)
-        if mat:
-            log_activity_db(
-                f"Gebruik gestopt (werf verwijderd: {project_name})",
-                mat.name or "",
-                mat.serial or ""
-            )
+    # 1. Stop alle actieve MaterialUsage records van deze werf in één bulk
+    # UPDATE in plaats van een ORM-mutatie per rij; de timestamp komt via
+    # func.now() uit de database, dus er gaat geen wall-clock per rij mee
+    stopped_material_ids = db.session.execute(
+        update(MaterialUsage)
+        .where(
+            MaterialUsage.project_id == project_id_int,
+            MaterialUsage.is_active.is_(True),
+        )
+        .values(is_active=False, end_time=func.now(), project_id=None)
+        .returning(MaterialUsage.material_id)
+    ).scalars().all()
+
+    materials_to_update = set(stopped_material_ids)
+    activity_rows = []  # activiteiten verzamelen en na de hoofdcommit in bulk wegschrijven
 
     # 2. Update alle Material records die aan deze werf gekoppeld zijn
     materials = Material.query.filter_by(werf_id=project_id_int).all()
-    
+    mat_ids = [mat.id for mat in materials]
+
+    # Naam/serienummer voor de logging van gestopte usages: meestal zitten
+    # die materialen al in de werf-lijst, de rest in één IN-query
+    mat_info = {mat.id: mat for mat in materials}
+    missing_ids = [mid for mid in materials_to_update if mid is not None and mid not in mat_info]
+    if missing_ids:
+        for row in (
+            db.session.query(Material.id, Material.name, Material.serial)
+            .filter(Material.id.in_(missing_ids))
+        ):
+            mat_info[row.id] = row
+
+    for mid in stopped_material_ids:
+        info = mat_info.get(mid)
+        if info:
+            activity_rows.append({
+                "action": f"Gebruik gestopt (werf verwijderd: {project_name})",
+                "name": info.name or "",
+                "serial": info.serial or "",
+            })
+
+    # Tel actieve usages op ANDERE werven per materiaal in één GROUP BY query
+    # (usages op deze werf zijn hierboven al gestopt)
+    other_active_counts = {}
+    if mat_ids:
+        other_active_counts = dict(
+            db.session.query(MaterialUsage.material_id, func.count())
+            .filter(
+                MaterialUsage.is_active.is_(True),
+                MaterialUsage.material_id.in_(mat_ids),
+                or_(
+                    MaterialUsage.project_id != project_id_int,
+                    MaterialUsage.project_id.is_(None)
+                )
+            )
+            .group_by(MaterialUsage.material_id)
+            .all()
+        )
+
     for mat in materials:
         mat.werf_id = None
         mat.site = None
-        
+
         # Als het materiaal "in gebruik" was, zet status op "niet in gebruik"
         # Maar controleer eerst of er nog andere actieve usages zijn
-        other_active_usages = MaterialUsage.query.filter_by(
-            material_id=mat.id,
-            is_active=True
-        ).count()
-        
-        if mat.status == "in gebruik" and other_active_usages == 0:
+        if mat.status == "in gebruik" and other_active_counts.get(mat.id, 0) == 0:
             mat.status = "niet in gebruik"
-        
+
         materials_to_update.add(mat.id)
-        
+
         # Log activiteit
-        log_activity_db(
-            f"Ontkoppeld van werf: {project_name}",
-            mat.name or "",
-            mat.serial or ""
-        )
+        activity_rows.append({
+            "action": f"Ontkoppeld van werf: {project_name}",
+            "name": mat.name or "",
+            "serial": mat.serial or "",
+        })
 
     # 3. Soft delete de werf
     project.is_deleted = True
-    
+
     db.session.commit()
+    cache.delete_memoized(_autocomplete_projects)
+
+    # Schrijf alle activiteiten in één INSERT weg (i.p.v. commit per activiteit)
+    log_activities_bulk(activity_rows)
 
     # Tel hoeveel materialen zijn geüpdatet
     materials_count = len(materials_to_update)
@@ -192,20 +309,31 @@ def werf_detail(project_id):
     project = Project.query.filter_by(id=project_id, is_deleted=False).first_or_404()
     today = datetime.utcnow().date()
 
-    # Debug: print image_url info
-    if project.image_url:
-        image_url_result = get_file_url_from_path(project.image_url)
-        print(f"DEBUG: Project {project_id} - image_url in DB: {project.image_url}")
-        print(f"DEBUG: Generated URL: {image_url_result}")
+    # Debug logging: alleen formatteren (en de URL genereren) als DEBUG aan staat,
+    # zodat de hot path in productie geen print/f-string overhead heeft
+    if project.image_url and current_app.logger.isEnabledFor(logging.DEBUG):
+        current_app.logger.debug(
+            "Project %s - image_url in DB: %s, generated URL: %s",
+            project_id, project.image_url, get_file_url_from_path(project.image_url)
+        )
 
-    # alle materialen
-    all_materials = Material.query.all()
-    
-    # Bepaal welke materialen in gebruik zijn (overal, niet alleen deze werf)
-    active_material_ids = set()
-    all_active_usages = MaterialUsage.query.filter(MaterialUsage.is_active.is_(True)).all()
-    for usage in all_active_usages:
-        active_material_ids.add(usage.material_id)
+    # alle materialen + in-gebruik vlag in één query: de datalist in de template
+    # gebruikt alleen id en naam, en de EXISTS-probe per rij loopt via de
+    # partial index op actieve usages (zie DDL MODEL.sql)
+    material_rows = db.session.query(
+        Material.id,
+        Material.name,
+        exists()
+        .where(
+            MaterialUsage.material_id == Material.id,
+            MaterialUsage.is_active.is_(True),
+        )
+        .label("in_use"),
+    ).all()
+    # De Rows gaan rechtstreeks naar de template: die leest m.id/m.name via
+    # attribuut-toegang, dus uitpakken naar kale tuples zou de datalist breken
+    all_materials = material_rows
+    active_material_ids = {row.id for row in material_rows if row.in_use}
 
     # actieve usages op deze werf
     active_usages = (
@@ -246,15 +374,14 @@ def werf_detail(project_id):
 @werven_bp.route("/werven/<int:project_id>/edit", methods=["POST"])
 @login_required
 def werf_bewerken(project_id):
-    project = Project.query.filter_by(id=project_id, is_deleted=False).first_or_404()
     f = request.form
 
-    name = (f.get("name") or "").strip()
-    type_ = (f.get("type") or "").strip()
-    address = (f.get("address") or "").strip()
-    start_date_str = (f.get("start_date") or "").strip()
-    end_date_str = (f.get("end_date") or "").strip()
-    note = (f.get("note") or "").strip()
+    name = _form_str(f, "name")
+    type_ = _form_str(f, "type")
+    address = _form_str(f, "address")
+    start_date_str = _form_str(f, "start_date")
+    end_date_str = _form_str(f, "end_date")
+    note = _form_str(f, "note")
 
     image_file = request.files.get("image_file")
 
@@ -263,29 +390,56 @@ def werf_bewerken(project_id):
         return redirect(url_for("werven.werf_detail", project_id=project_id))
 
     try:
-        project.start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        start_date = date.fromisoformat(start_date_str)
     except ValueError:
         flash("Ongeldige startdatum.", "danger")
         return redirect(url_for("werven.werf_detail", project_id=project_id))
 
+    end_date = None
     if end_date_str:
         try:
-            project.end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+            end_date = date.fromisoformat(end_date_str)
         except ValueError:
             flash("Ongeldige einddatum.", "danger")
             return redirect(url_for("werven.werf_detail", project_id=project_id))
-    else:
-        project.end_date = None
 
-    project.name = name
-    project.type = type_ or None
-    project.address = address or None
-    project.note = note or None
+    values = {
+        "name": name,
+        "type": type_ or None,
+        "address": address or None,
+        "start_date": start_date,
+        "end_date": end_date,
+        "note": note or None,
+    }
 
+    image_payload = None
     if image_file and image_file.filename:
-        project.image_url = save_project_image(image_file, name.replace(" ", "_"))
+        if current_app.config.get("ASYNC_IMAGE_UPLOADS", True):
+            image_payload = (image_file.read(), image_file.filename, image_file.content_type)
+        else:
+            values["image_url"] = save_project_image(image_file, name.replace(" ", "_"))
+
+    # Eén UPDATE...RETURNING in plaats van SELECT + ORM-flush: de returning
+    # vervangt de eerdere first_or_404-existence check
+    result = db.session.execute(
+        update(Project)
+        .where(Project.id == project_id, Project.is_deleted.is_(False))
+        .values(**values)
+        .returning(Project.id)
+    )
+    if result.first() is None:
+        db.session.rollback()
+        abort(404)
 
     db.session.commit()
+    cache.delete_memoized(_autocomplete_projects)
+
+    if image_payload:
+        data, filename, content_type = image_payload
+        _submit_project_image_upload(
+            project_id, data, filename, content_type, name.replace(" ", "_")
+        )
+
     flash("Werfgegevens bijgewerkt.", "success")
     return redirect(url_for("werven.werf_detail", project_id=project_id))
 
@@ -296,9 +450,9 @@ def werf_materiaal_gebruiken(project_id):
     project = Project.query.filter_by(id=project_id, is_deleted=False).first_or_404()
     f = request.form
 
-    name = (f.get("name") or "").strip()
-    nummer = (f.get("nummer_op_materieel") or "").strip()
-    assigned_to = (f.get("assigned_to") or "").strip()
+    name = _form_str(f, "name")
+    nummer = _form_str(f, "nummer_op_materieel")
+    assigned_to = _form_str(f, "assigned_to")
 
     if not name and not nummer:
         flash("Naam of nummer op materieel is verplicht.", "danger")
@@ -309,42 +463,60 @@ def werf_materiaal_gebruiken(project_id):
         flash("Materiaal niet gevonden in het datasysteem.", "danger")
         return redirect(url_for("werven.werf_detail", project_id=project_id))
 
-    # Check if material is already in use
-    active_usage = MaterialUsage.query.filter_by(
-        material_id=item.id,
-        is_active=True
-    ).first()
-    
-    if active_usage:
-        flash("Materiaal is niet beschikbaar voor deze toewijzing.", "danger")
-        return redirect(url_for("werven.werf_detail", project_id=project_id))
-
     if not assigned_to and getattr(g, "user", None):
         assigned_to = g.user.naam or "" if getattr(g, "user", None) else ""
 
-    # update materiaal zelf
-    item.assigned_to = assigned_to
-    item.site = project.name or item.site
-    item.werf_id = project_id
-    
-    # Set status to "in gebruik"
-    item.status = "in gebruik"
+    site_value = project.name or item.site
 
     # In de database is user_id NOT NULL, dus we gebruiken altijd de ingelogde gebruiker
     user_id = g.user.gebruiker_id
-    usage = MaterialUsage(
-        material_id=item.id,
-        user_id=user_id,
-        site=item.site,
-        note=None,
-        start_time=datetime.utcnow(),
-        end_time=None,
-        is_active=True,
-        used_by=assigned_to or (g.user.naam if getattr(g, "user", None) else None),
-        project_id=project_id,
+
+    # Atomaire beschikbaarheidscheck + insert in één statement:
+    # INSERT ... SELECT ... WHERE NOT EXISTS (actieve usage voor dit materiaal).
+    # Dit vervangt de aparte SELECT-then-INSERT (TOCTOU race, 2 round trips);
+    # de unieke partial index ux_materiaal_gebruik_actief (zie DDL MODEL.sql)
+    # sluit de race tussen gelijktijdige requests definitief uit.
+    stmt = insert(MaterialUsage).from_select(
+        [
+            MaterialUsage.material_id,
+            MaterialUsage.user_id,
+            MaterialUsage.site,
+            MaterialUsage.start_time,
+            MaterialUsage.is_active,
+            MaterialUsage.used_by,
+            MaterialUsage.project_id,
+        ],
+        select(
+            literal(item.id),
+            literal(user_id),
+            literal(site_value),
+            func.now(),
+            literal(True),
+            literal(assigned_to or (g.user.naam if getattr(g, "user", None) else None)),
+            literal(project_id),
+        ).where(
+            ~exists().where(
+                MaterialUsage.material_id == item.id,
+                MaterialUsage.is_active.is_(True),
+            )
+        ),
     )
+    result = db.session.execute(stmt)
+
+    if result.rowcount == 0:
+        # Er bestond al een actieve usage - materiaal is niet beschikbaar
+        db.session.rollback()
+        flash("Materiaal is niet beschikbaar voor deze toewijzing.", "danger")
+        return redirect(url_for("werven.werf_detail", project_id=project_id))
+
+    # update materiaal zelf (zelfde transactie als de insert)
+    item.assigned_to = assigned_to
+    item.site = site_value
+    item.werf_id = project_id
+
+    # Set status to "in gebruik"
+    item.status = "in gebruik"
 
-    db.session.add(usage)
     db.session.commit()
 
     log_activity_db("In gebruik (werf)", item.name or "", item.serial or "")
@@ -356,12 +528,19 @@ def werf_materiaal_gebruiken(project_id):
 @login_required
 def werf_stop_gebruik(project_id):
     """Stop gebruik van materiaal vanuit de werf-detailpagina."""
-    usage_id = (request.form.get("usage_id") or "").strip()
+    usage_id = _form_str(request.form, "usage_id")
     if not usage_id:
         flash("Geen gebruiksessie gevonden.", "danger")
         return redirect(url_for("werven.werf_detail", project_id=project_id))
 
-    usage = MaterialUsage.query.filter_by(id=usage_id, project_id=project_id).first()
+    # Slanke projectie: alleen de velden die we nodig hebben voor de checks
+    usage = (
+        db.session.query(
+            MaterialUsage.material_id, MaterialUsage.used_by, MaterialUsage.is_active
+        )
+        .filter(MaterialUsage.id == usage_id, MaterialUsage.project_id == project_id)
+        .first()
+    )
     if not usage or not usage.is_active:
         flash("Gebruiksregistratie niet gevonden.", "danger")
         return redirect(url_for("werven.werf_detail", project_id=project_id))
@@ -370,37 +549,55 @@ def werf_stop_gebruik(project_id):
     current_user_name = g.user.naam if getattr(g, "user", None) else None
     is_admin = getattr(g.user, 'is_admin', False) if getattr(g, "user", None) else False
     usage_name = (usage.used_by or "").strip()
-    
+
     is_own_usage = current_user_name and usage_name.lower() == current_user_name.lower()
-    
+
     if not is_own_usage and not is_admin:
         flash("Je kunt alleen je eigen materiaal stoppen. Neem contact op met een admin.", "danger")
         return redirect(url_for("werven.werf_detail", project_id=project_id))
 
-    usage.is_active = False
-    usage.end_time = datetime.utcnow()
-
-    mat = Material.query.filter_by(id=usage.material_id).first()
-    if mat:
-        if mat.assigned_to == usage.used_by:
-            mat.assigned_to = None
-            mat.site = None
-        
-        # Check if there are any other active usages for this material
-        other_active_usages = MaterialUsage.query.filter_by(
-            material_id=mat.id, 
-            is_active=True
-        ).count()
-        
-        # If no other active usages, set status to "niet in gebruik"
-        if other_active_usages == 0:
-            mat.status = "niet in gebruik"
+    # Statement 1: stop de usage. De extra is_active-voorwaarde maakt dit
+    # idempotent bij dubbel klikken/refresh van het formulier.
+    db.session.execute(
+        update(MaterialUsage)
+        .where(
+            MaterialUsage.id == usage_id,
+            MaterialUsage.is_active.is_(True),
+        )
+        .values(is_active=False, end_time=func.now())
+    )
+
+    # Statement 2: update het materiaal in één UPDATE. De subquery telt de
+    # resterende actieve usages binnen hetzelfde statement, zodat er geen race
+    # zit tussen het tellen en het zetten van de status. De CASE-expressies
+    # zien de oude waarde van assigned_to (Postgres gebruikt in een UPDATE de
+    # rijwaarden van vóór de wijziging).
+    remaining_active = (
+        select(func.count())
+        .select_from(MaterialUsage)
+        .where(
+            MaterialUsage.material_id == usage.material_id,
+            MaterialUsage.is_active.is_(True),
+        )
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(Material)
+        .where(Material.id == usage.material_id)
+        .values(
+            assigned_to=case((Material.assigned_to == usage.used_by, null()), else_=Material.assigned_to),
+            site=case((Material.assigned_to == usage.used_by, null()), else_=Material.site),
+            status=case((remaining_active == 0, "niet in gebruik"), else_=Material.status),
+        )
+        .returning(Material.name, Material.serial)
+    )
+    mat_row = result.first()
 
     db.session.commit()
 
-    if mat:
+    if mat_row:
         log_activity_db(
-            "Niet meer in gebruik (werf)", mat.name or "", mat.serial or ""
+            "Niet meer in gebruik (werf)", mat_row.name or "", mat_row.serial or ""
         )
 
     flash("Materiaal is niet langer in gebruik op deze werf.", "success")
@@ -411,8 +608,8 @@ def werf_stop_gebruik(project_id):
 @login_required
 def werf_switch_material(project_id):
     """Wissel materiaal van huidige werf naar een andere werf."""
-    usage_id = (request.form.get("usage_id") or "").strip()
-    new_project_id = (request.form.get("new_project_id") or "").strip()
+    usage_id = _form_str(request.form, "usage_id")
+    new_project_id = _form_str(request.form, "new_project_id")
 
     if not usage_id or not new_project_id:
         flash("Selecteer een werf om het materiaal naar te verplaatsen.", "danger")
@@ -430,18 +627,26 @@ def werf_switch_material(project_id):
         flash("Doelwerf niet gevonden.", "danger")
         return redirect(url_for("werven.werf_detail", project_id=project_id))
 
-    # Haal materiaal op
-    mat = Material.query.filter_by(id=usage.material_id).first()
+    # Haal materiaal op via de primary key (identity map: geen SELECT als het
+    # object al in de sessie zit)
+    mat = db.session.get(Material, usage.material_id)
     if not mat:
         flash("Materiaal niet gevonden.", "danger")
         return redirect(url_for("werven.werf_detail", project_id=project_id))
 
-    # Update usage en materiaal naar nieuwe werf
-    usage.project_id = int(new_project_id)  # project_id is alias voor werf_id
-    usage.site = new_project.name
-    mat.werf_id = int(new_project_id)
-    mat.site = new_project.name
-
+    # Update usage en materiaal naar nieuwe werf: één UPDATE per tabel in
+    # plaats van een ORM-flush over beide objecten
+    new_project_id_int = int(new_project_id)
+    db.session.execute(
+        update(MaterialUsage)
+        .where(MaterialUsage.id == usage.id)
+        .values(project_id=new_project_id_int, site=new_project.name)
+    )
+    db.session.execute(
+        update(Material)
+        .where(Material.id == mat.id)
+        .values(werf_id=new_project_id_int, site=new_project.name)
+    )
     db.session.commit()
 
     log_activity_db(
@@ -452,54 +657,64 @@ def werf_switch_material(project_id):
     return redirect(url_for("werven.werf_detail", project_id=project_id))
 
 
+class _Echo:
+    """Pseudo-buffer voor csv.writer: geeft de geschreven rij direct terug zodat
+    we die kunnen yielden in plaats van alles in een StringIO te bufferen."""
+
+    def write(self, value):
+        return value
+
+
 @werven_bp.route("/werven/<int:project_id>/export")
 @login_required
 def werf_export_materiaal(project_id):
-    """Export materiaal in gebruik op deze werf naar CSV"""
+    """Export materiaal in gebruik op deze werf naar CSV (streaming)"""
     project = Project.query.filter_by(id=project_id, is_deleted=False).first_or_404()
 
-    # Haal actieve usages op voor deze werf
-    active_usages = (
-        db.session.query(MaterialUsage, Material)
-        .join(Material, MaterialUsage.material_id == Material.id)
-        .filter(
-            MaterialUsage.is_active.is_(True),
-            MaterialUsage.project_id == project_id,
-        )
-        .order_by(MaterialUsage.start_time.desc())
-        .all()
-    )
+    project_name = project.name or f'Werf {project.id}'
+
+    def generate():
+        # Stream rij per rij: geheugen blijft O(1) en de eerste bytes vertrekken
+        # meteen naar de client in plaats van na de volledige serialisatie
+        writer = csv.writer(_Echo())
 
-    # Maak CSV
-    output = StringIO()
-    writer = csv.writer(output)
-
-    # Headers
-    writer.writerow([
-        'Werf', 'Materieel', 'Serienummer', 'Nummer op materieel',
-        'Gebruikt door', 'In gebruik sinds', 'Status'
-    ])
-
-    # Data
-    for usage, mat in active_usages:
-        writer.writerow([
-            project.name or f'Werf {project.id}',
-            mat.name or '',
-            mat.serial or '',
-            mat.nummer_op_materieel or '',
-            usage.used_by or '',
-            usage.start_time.strftime('%Y-%m-%d %H:%M') if usage.start_time else '',
-            mat.status or '',
+        # Headers
+        yield writer.writerow([
+            'Werf', 'Materieel', 'Serienummer', 'Nummer op materieel',
+            'Gebruikt door', 'In gebruik sinds', 'Status'
         ])
 
-    # Maak response
-    output.seek(0)
-    filename = f"werf_{project.name or project.id}_materiaal_{datetime.utcnow().strftime('%Y%m%d')}.csv"
-    # Vervang ongeldige karakters in bestandsnaam
-    filename = "".join(c if c.isalnum() or c in '._-' else '_' for c in filename)
-    
+        # Haal actieve usages op voor deze werf via een server-side cursor
+        active_usages = (
+            db.session.query(MaterialUsage, Material)
+            .join(Material, MaterialUsage.material_id == Material.id)
+            .filter(
+                MaterialUsage.is_active.is_(True),
+                MaterialUsage.project_id == project_id,
+            )
+            .order_by(MaterialUsage.start_time.desc())
+            .yield_per(500)
+        )
+
+        for usage, mat in active_usages:
+            yield writer.writerow([
+                project_name,
+                mat.name or '',
+                mat.serial or '',
+                mat.nummer_op_materieel or '',
+                usage.used_by or '',
+                usage.start_time.strftime('%Y-%m-%d %H:%M') if usage.start_time else '',
+                mat.status or '',
+            ])
+
+    # Vervang ongeldige karakters in de bestandsnaam (regex draait in C,
+    # geen per-karakter Python overhead)
+    filename = _FILENAME_RE.sub(
+        "_", f"werf_{project.name or project.id}_materiaal_{datetime.utcnow():%Y%m%d}.csv"
+    )
+
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
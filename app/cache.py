@@ -0,0 +1,9 @@
+"""
+Centrale cache instantie (Flask-Caching) - wordt geïnitialiseerd in app.py.
+
+SimpleCache is een in-process cache: voldoende voor deze deployment en
+vereist geen extra infrastructuur (Redis/Memcached).
+"""
+from flask_caching import Cache
+
+cache = Cache(config={"CACHE_TYPE": "SimpleCache"})
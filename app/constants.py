@@ -1,10 +1,15 @@
 """
 Constants for the application - centralized option lists and configuration values.
 This ensures consistency across templates, routes, and JavaScript.
+
+All constants are read-only: dicts are wrapped in MappingProxyType and the
+VALID_* collections are frozensets (membership checks in O(1) i.p.v. list scan).
 """
 
+from types import MappingProxyType
+
 # Material Inspection Status Options
-INSPECTION_STATUSES = {
+INSPECTION_STATUSES = MappingProxyType({
     "goedgekeurd": {
         "value": "goedgekeurd",
         "label": "Goedgekeurd",
@@ -40,11 +45,11 @@ INSPECTION_STATUSES = {
         "badge_style": "background-color: white; color: #212529; border: 1px solid #ffc107;",
         "bootstrap_class": "bg-warning"
     }
-}
+})
 
 # Keuring Status Options for form dropdown (used in "Nieuw Materiaal" modal)
 # NOTE: "keuring gepland" is verwijderd - te complex voor create flow
-KEURING_STATUS_OPTIONS = {
+KEURING_STATUS_OPTIONS = MappingProxyType({
     "goedgekeurd": {
         "value": "goedgekeurd",
         "label": "Goedgekeurd"
@@ -57,10 +62,10 @@ KEURING_STATUS_OPTIONS = {
         "value": "onder voorbehoud",
         "label": "Onder voorbehoud"
     }
-}
+})
 
 # Material Usage Status Options
-USAGE_STATUSES = {
+USAGE_STATUSES = MappingProxyType({
     "in gebruik": {
         "value": "in gebruik",
         "label": "In gebruik",
@@ -71,10 +76,10 @@ USAGE_STATUSES = {
         "label": "Niet in gebruik",
         "badge_class": "bg-danger"
     }
-}
+})
 
 # Keuring Result Options
-KEURING_RESULTATEN = {
+KEURING_RESULTATEN = MappingProxyType({
     "goedgekeurd": {
         "value": "goedgekeurd",
         "label": "✓ Goedgekeurd",
@@ -90,22 +95,22 @@ KEURING_RESULTATEN = {
         "label": "⚠ Voorwaardelijk",
         "badge_class": "bg-warning"
     }
-}
+})
 
 # Default inspection status
 DEFAULT_INSPECTION_STATUS = "goedgekeurd"
 
-# Valid inspection statuses list (for validation)
-VALID_INSPECTION_STATUSES = list(INSPECTION_STATUSES.keys())
+# Valid inspection statuses (for validation)
+VALID_INSPECTION_STATUSES = frozenset(INSPECTION_STATUSES)
 
-# Valid usage statuses list
-VALID_USAGE_STATUSES = list(USAGE_STATUSES.keys())
+# Valid usage statuses
+VALID_USAGE_STATUSES = frozenset(USAGE_STATUSES)
 
-# Valid keuring resultaten list
-VALID_KEURING_RESULTATEN = list(KEURING_RESULTATEN.keys())
+# Valid keuring resultaten
+VALID_KEURING_RESULTATEN = frozenset(KEURING_RESULTATEN)
 
 # Keuring Status Filter Options (for dropdowns in templates)
-KEURING_STATUS_FILTERS = {
+KEURING_STATUS_FILTERS = MappingProxyType({
     "te_laat": {
         "value": "te_laat",
         "label": "Te laat"
@@ -122,25 +127,25 @@ KEURING_STATUS_FILTERS = {
         "value": "afgekeurd",
         "label": "Afgekeurd"
     }
-}
+})
 
 # Valid keuring status filter values
-VALID_KEURING_STATUS_FILTERS = list(KEURING_STATUS_FILTERS.keys())
+VALID_KEURING_STATUS_FILTERS = frozenset(KEURING_STATUS_FILTERS)
 
 # Period Filter Options (for geschiedenis page)
-PERIOD_FILTERS = {
+PERIOD_FILTERS = MappingProxyType({
     "all": {"value": "all", "label": "Alle tijd"},
     "today": {"value": "today", "label": "Vandaag"},
     "week": {"value": "week", "label": "Afgelopen week"},
     "month": {"value": "month", "label": "Afgelopen maand"}
-}
+})
 
 # Document Types
-DOCUMENT_TYPES = [
+DOCUMENT_TYPES = (
     "Aankoopfactuur",
     "Keuringstatus",
     "Veiligheidsfiche",
-    "Verkoopfactuur"
-]
+    "Verkoopfactuur",
+)
 
 
@@ -1,12 +1,28 @@
 """
 Shared helper functions used across multiple blueprints
 """
-from flask import g, session, redirect, url_for, request, current_app
+from flask import g, session, redirect, url_for, request, current_app, has_request_context
 from models import db, Gebruiker, Activity
-from datetime import datetime
+from sqlalchemy import insert
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
 from typing import Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+import atexit
+import io
+import logging
 import os
+import re
+import shutil
+import threading
+import time
+
+# Module-logger: %s-argumenten worden pas gerenderd als het level actief is,
+# dus een gedeactiveerde debug/info-call kost geen f-string allocatie en
+# geen stdout-lock in het hete URL-pad
+_log = logging.getLogger(__name__)
 
 # Supabase Storage
 try:
@@ -18,26 +34,124 @@ except ImportError:
 # Global supabase client - will be initialized by app
 _supabase_client: Optional[Client] = None
 
+# Paden die alleen uit deze karakters bestaan hoeven niet ge-encodeerd te
+# worden; secure_filename-output valt hier vrijwel altijd onder
+_URL_SAFE_PATH_RE = re.compile(r"^[A-Za-z0-9._\-/]+$")
+
+# Bekende bucket-namen: de prefix-strip gebeurt in één C-level regex-stap
+# in plaats van een startswith-lus met f-string allocaties per bucket
+_KNOWN_BUCKETS = frozenset({
+    "Aankoop-Verkoop documenten", "Keuringsstatus", "Veiligheidsfiche",
+    "type-images", "projects",
+})
+_BUCKET_PREFIX_RE = re.compile(
+    r"^(?:Aankoop-Verkoop documenten|Keuringsstatus|Veiligheidsfiche|type-images|projects)/"
+)
+
+# Bestandsnamen die hier al aan voldoen hoeven niet door secure_filename
+# (regex-substituties) heen
+_SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+
+# Pad-prefix -> (bucket, nieuwe prefix) voor get_file_url_from_path.
+# De uploads/-varianten staan vóór hun korte vorm; None betekent dat het
+# pad al de juiste prefix heeft en ongewijzigd doorgaat (geen allocatie)
+_PATH_PREFIX_MAP = (
+    ("uploads/docs/", "docs", "docs/"),
+    ("docs/", "docs", None),
+    ("uploads/safety/", "safety", "safety/"),
+    ("safety/", "safety", None),
+    ("uploads/projects/", "projects", "projects/"),
+    ("projects/", "projects", None),
+    ("uploads/certificates/", "certificates", "certificates/"),
+    ("certificates/", "certificates", None),
+    ("uploads/type_images/", "type-images", "type-images/"),
+    ("type_images/", "type-images", "type-images/"),
+    ("type-images/", "type-images", None),
+)
+
+# Extensies waarvoor een kaal pad als type-image wordt behandeld
+_IMAGE_EXTS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.webp'})
+
+# Buckets met documenten: geen lokale fallback, fouten moeten de route bereiken
+_DOCUMENT_BUCKETS = frozenset({
+    "Aankoop-Verkoop documenten", "Keuringsstatus", "Veiligheidsfiche",
+})
+
+
+def _clean_path(file_path: Optional[str]) -> Optional[str]:
+    """
+    Gedeelde guard voor de URL-helpers: strip whitespace en omringende
+    slashes in één C-level pass. Leeg/None (ook na strippen) wordt None.
+    """
+    if not file_path:
+        return None
+    return file_path.strip(" \t\r\n/") or None
+
+
+def _upload_timestamp() -> str:
+    """
+    Timestamp voor upload-bestandsnamen; binnen één request delen alle
+    bestanden dezelfde waarde zodat strftime maar één keer draait.
+    time.strftime op time.gmtime() slaat de datetime-objectconstructie
+    van datetime.utcnow() over.
+    """
+    if has_request_context():
+        ts = getattr(g, "_upload_ts", None)
+        if ts is None:
+            ts = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+            g._upload_ts = ts
+        return ts
+    return time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+
+# Gedeelde pool voor niet-blokkerende Supabase uploads
+_upload_pool: Optional[ThreadPoolExecutor] = None
+
 def init_supabase_client(supabase_client: Optional[Client]):
     """Initialize the supabase client for file uploads"""
-    global _supabase_client
+    global _supabase_client, _upload_pool
     _supabase_client = supabase_client
+    # Gecachte publieke URLs horen bij de vorige client-configuratie
+    _build_public_url.cache_clear()
+    if supabase_client is not None and _upload_pool is None:
+        _upload_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="supabase-upload")
 
 
-def upload_folder_from_bucket(bucket_name: str) -> str:
-    """Map bucket naam naar lokale upload folder (alleen voor niet-documenten fallback)."""
+def init_upload_dispatch(app):
+    """
+    Bouw de upload-dispatch tabellen één keer op uit de (geresolvede) config,
+    zodat save_upload en upload_folder_from_bucket per call een dict-lookup
+    doen in plaats van config-lookups plus string-vergelijkingen.
+    Aanroepen vanuit app.py nadat de upload folders in de config staan.
+    """
+    project_folder = app.config["PROJECT_UPLOAD_FOLDER"]
+    type_image_folder = app.config["TYPE_IMAGE_UPLOAD_FOLDER"]
+
+    # upload folder -> (bucket, subfolder) voor save_upload
+    folder_to_bucket = {
+        type_image_folder: ("type-images", ""),
+        project_folder: ("projects", ""),
+    }
+
+    # bucket -> lokale upload folder (alleen voor niet-documenten fallback)
     bucket_to_folder = {
-        "projects": current_app.config["PROJECT_UPLOAD_FOLDER"],
-        "type-images": current_app.config["TYPE_IMAGE_UPLOAD_FOLDER"],
+        "projects": project_folder,
+        "type-images": type_image_folder,
         # Oude bucket namen (niet meer gebruikt voor documenten)
-        "docs": current_app.config["PROJECT_UPLOAD_FOLDER"],  # Fallback
-        "safety": current_app.config["PROJECT_UPLOAD_FOLDER"],  # Fallback
-        "certificates": current_app.config["PROJECT_UPLOAD_FOLDER"],  # Fallback
+        "docs": project_folder,  # Fallback
+        "safety": project_folder,  # Fallback
+        "certificates": project_folder,  # Fallback
         # Nieuwe bucket namen voor documenten - deze gebruiken Supabase, geen lokale fallback
-        "Aankoop-Verkoop documenten": current_app.config["PROJECT_UPLOAD_FOLDER"],  # Fallback (zou niet gebruikt moeten worden)
-        "Keuringsstatus": current_app.config["PROJECT_UPLOAD_FOLDER"],  # Fallback (zou niet gebruikt moeten worden)
-        "Veiligheidsfiche": current_app.config["PROJECT_UPLOAD_FOLDER"],  # Fallback (zou niet gebruikt moeten worden)
+        "Aankoop-Verkoop documenten": project_folder,  # Fallback (zou niet gebruikt moeten worden)
+        "Keuringsstatus": project_folder,  # Fallback (zou niet gebruikt moeten worden)
+        "Veiligheidsfiche": project_folder,  # Fallback (zou niet gebruikt moeten worden)
     }
+
+    app.extensions["upload_dispatch"] = (folder_to_bucket, bucket_to_folder)
+
+
+def upload_folder_from_bucket(bucket_name: str) -> str:
+    """Map bucket naam naar lokale upload folder (alleen voor niet-documenten fallback)."""
+    _, bucket_to_folder = current_app.extensions["upload_dispatch"]
     return bucket_to_folder.get(bucket_name, current_app.config["PROJECT_UPLOAD_FOLDER"])
 
 
@@ -53,7 +167,22 @@ def save_upload_local(file_storage, upload_folder, prefix: str) -> Optional[str]
     final_filename = f"{prefix}_{filename}"
 
     full_path = os.path.join(upload_folder, final_filename)
-    file_storage.save(full_path)
+
+    # Kopieer in kernel-space met sendfile als de spooled temp file al een
+    # echte fd heeft (grote uploads); fileno() op een in-memory spool zou
+    # een onnodige rollover naar disk forceren, dus dan (of als sendfile
+    # faalt) valt dit terug op copyfileobj met 64 KiB chunks
+    src = file_storage.stream
+    src.seek(0)
+    with open(full_path, "wb") as dst:
+        if hasattr(os, "sendfile") and getattr(src, "_rolled", False):
+            try:
+                os.sendfile(dst.fileno(), src.fileno(), 0, os.fstat(src.fileno()).st_size)
+            except (OSError, io.UnsupportedOperation):
+                src.seek(0)
+                shutil.copyfileobj(src, dst, length=64 * 1024)
+        else:
+            shutil.copyfileobj(src, dst, length=64 * 1024)
 
     if upload_folder == current_app.config["DOC_UPLOAD_FOLDER"]:
         relative_folder = "uploads/docs"
@@ -80,57 +209,114 @@ def save_upload_to_supabase(file_storage, bucket_name: str, folder: str, prefix:
     
     if not _supabase_client:
         # Voor documenten: geen fallback, gooi error
-        document_buckets = ["Aankoop-Verkoop documenten", "Keuringsstatus", "Veiligheidsfiche"]
-        if bucket_name in document_buckets:
+        if bucket_name in _DOCUMENT_BUCKETS:
             raise Exception(f"Supabase client niet beschikbaar. Documenten moeten naar Supabase bucket '{bucket_name}' worden geüpload.")
         # Alleen voor niet-documenten (type-images, projects): fallback naar lokaal
-        print("Warning: Supabase not available, falling back to local storage")
+        _log.warning("Supabase not available, falling back to local storage")
         return save_upload_local(file_storage, upload_folder_from_bucket(bucket_name), prefix)
     
-    # Genereer unieke bestandsnaam
-    filename = secure_filename(file_storage.filename)
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    final_filename = f"{prefix}_{timestamp}_{filename}"
-    
+    # Genereer unieke bestandsnaam; secure_filename alleen als de naam nog
+    # niet URL/pad-veilig is
+    filename = file_storage.filename
+    if not _SAFE_NAME_RE.match(filename):
+        filename = secure_filename(filename)
+    final_filename = f"{prefix}_{_upload_timestamp()}_{filename}"
+
     # Pad in bucket (bijv. "BOOR123_doc_20250101_120000_foto.pdf")
     file_path = f"{folder}/{final_filename}" if folder else final_filename
-    
-    # Lees bestand
-    file_content = file_storage.read()
-    file_storage.seek(0)  # Reset file pointer
-    
-    try:
-        # Upload naar Supabase Storage
-        response = _supabase_client.storage.from_(bucket_name).upload(
-            path=file_path,
-            file=file_content,
-            file_options={"content-type": file_storage.content_type or "application/octet-stream", "upsert": "true"}
-        )
-        
-        # Verifieer dat upload succesvol was door te proberen de URL op te halen
-        # Dit verifieert dat het bestand daadwerkelijk bestaat
-        try:
-            # Probeer de publieke URL op te halen - dit werkt alleen als het bestand bestaat
-            test_url = _supabase_client.storage.from_(bucket_name).get_public_url(file_path)
-            print(f"✓ Bestand succesvol geüpload en geverifieerd in bucket '{bucket_name}': {file_path}")
-            print(f"  URL: {test_url}")
-        except Exception as verify_error:
-            # Als verificatie faalt, kan het zijn dat het bestand nog niet beschikbaar is
-            # of dat er een probleem is met het pad
-            print(f"⚠ Upload voltooid, maar verificatie faalde voor bucket '{bucket_name}', path '{file_path}': {verify_error}")
-            print(f"  Het bestand kan nog beschikbaar komen, of er is een probleem met het pad.")
-        
-        # Retourneer het pad (wordt opgeslagen in database)
+
+    # Lege uploads vroeg afvangen: anders verschijnt er stilletjes een
+    # 0-byte bestand in de bucket (of lokaal). None laat de route zijn
+    # gewone "Fout bij uploaden"-flash tonen.
+    stream = file_storage.stream
+    stream.seek(0, 2)
+    if stream.tell() == 0:
+        _log.warning("Lege upload overgeslagen: %s", file_storage.filename)
+        return None
+    stream.seek(0)
+
+    content_type = file_storage.content_type or "application/octet-stream"
+
+    if bucket_name in _DOCUMENT_BUCKETS:
+        # Documenten: synchroon uploaden (met retry), fouten moeten de route
+        # bereiken zodat de gebruiker ze ziet. Upload rechtstreeks vanuit de
+        # spooled temp file van Werkzeug: geen extra bytes-kopie in RAM.
+        file_storage.stream.seek(0)
+        error = _do_upload(bucket_name, file_path, file_storage.stream, content_type)
+        file_storage.seek(0)  # Reset file pointer
+        if error is not None:
+            raise Exception(f"Kon document niet uploaden naar Supabase bucket '{bucket_name}': {error}")
         return file_path
-        
-    except Exception as e:
-        print(f"Error uploading to Supabase Storage bucket '{bucket_name}': {e}")
-        # Voor documenten: geen fallback, gooi error door
-        document_buckets = ["Aankoop-Verkoop documenten", "Keuringsstatus", "Veiligheidsfiche"]
-        if bucket_name in document_buckets:
-            raise Exception(f"Kon document niet uploaden naar Supabase bucket '{bucket_name}': {e}")
-        # Alleen voor niet-documenten: fallback naar lokaal
+
+    # Niet-documenten (type-images, projects): het pad staat al vast, dus de
+    # upload kan op de achtergrond-pool terwijl de response al vertrekt.
+    # Hier moeten we wél naar bytes kopiëren: de FileStorage (en zijn temp
+    # file) leeft alleen zolang de request duurt.
+    if _upload_pool is not None:
+        file_content = file_storage.read()
+        file_storage.seek(0)  # Reset file pointer
+        future = _upload_pool.submit(_do_upload, bucket_name, file_path, file_content, content_type)
+        del file_content  # de pool-taak houdt de enige referentie vast
+        if has_request_context():
+            # Bijhouden per request; de after_request hook kan hierop wachten
+            # voor endpoints die sterke consistentie nodig hebben
+            if not hasattr(g, "pending_uploads"):
+                g.pending_uploads = []
+            g.pending_uploads.append(future)
+        return file_path
+
+    # Geen pool beschikbaar: synchroon streamen, bij fout lokaal opslaan
+    file_storage.stream.seek(0)
+    error = _do_upload(bucket_name, file_path, file_storage.stream, content_type)
+    file_storage.seek(0)
+    if error is not None:
         return save_upload_local(file_storage, upload_folder_from_bucket(bucket_name), prefix)
+    return file_path
+
+
+def _coerce_upload_payload(file_content):
+    """
+    storage3 accepteert alleen bytes, BufferedReader of FileIO als payload;
+    elk ander type wordt in de SDK als bestandspad behandeld (open(file)).
+    BytesIO/SpooledTemporaryFile streams van Werkzeug lezen we hier dus
+    één keer uit naar bytes; een echte BufferedReader/FileIO mag blijven
+    streamen. Een memoryview/bytearray-bufferpool valt om dezelfde reden
+    af: de isinstance-check van de SDK laat die niet door.
+    """
+    if isinstance(file_content, (bytes, io.BufferedReader, io.FileIO)):
+        return file_content
+    if hasattr(file_content, "read"):
+        file_content.seek(0)
+        return file_content.read()
+    return file_content
+
+
+def _do_upload(bucket_name: str, file_path: str, file_content, content_type: str) -> Optional[Exception]:
+    """
+    Voer de eigenlijke Supabase-upload uit met retry/backoff (3 pogingen).
+    file_content mag bytes of een file-like object zijn; een stream wordt
+    per poging teruggespoeld. Retourneert None bij succes, anders de laatste
+    exception. Draait meestal op de upload-pool, buiten de request-thread.
+    """
+    file_content = _coerce_upload_payload(file_content)
+    last_error = None
+    for attempt in range(3):
+        try:
+            if hasattr(file_content, "seek"):
+                file_content.seek(0)
+            _supabase_client.storage.from_(bucket_name).upload(
+                path=file_path,
+                file=file_content,
+                file_options={"content-type": content_type, "upsert": "true"}
+            )
+            _log.info("Bestand geüpload naar bucket '%s': %s", bucket_name, file_path)
+            return None
+        except Exception as e:
+            last_error = e
+            time.sleep(2 ** attempt)
+    _log.error("Error uploading to Supabase Storage bucket '%s', path '%s': %s",
+               bucket_name, file_path, last_error)
+    return last_error
 
 
 def save_upload(file_storage, upload_folder, prefix: str) -> Optional[str]:
@@ -141,28 +327,20 @@ def save_upload(file_storage, upload_folder, prefix: str) -> Optional[str]:
     OPGELET: Deze functie wordt alleen gebruikt voor type-images en projects.
     Voor documenten moet save_upload_to_supabase direct worden gebruikt met de juiste bucket naam.
     """
-    # Bepaal bucket en folder op basis van upload_folder
+    # Bepaal bucket en folder via de vooraf opgebouwde dispatch-tabel
     # OPGELET: Deze functie wordt alleen gebruikt voor niet-documenten (type-images, projects)
     # Documenten moeten direct via save_upload_to_supabase met Nederlandse bucket namen
-    if upload_folder == current_app.config["TYPE_IMAGE_UPLOAD_FOLDER"]:
-        bucket = "type-images"
-        folder = ""
-    elif upload_folder == current_app.config["PROJECT_UPLOAD_FOLDER"]:
-        bucket = "projects"
-        folder = ""
-    else:
-        # Fallback - maar dit zou niet moeten voorkomen voor documenten
-        # Documenten moeten direct via save_upload_to_supabase
-        bucket = "type-images"  # default voor niet-documenten
-        folder = ""
-    
+    folder_to_bucket, _ = current_app.extensions["upload_dispatch"]
+    # Fallback naar type-images - documenten horen hier niet te komen
+    bucket, folder = folder_to_bucket.get(upload_folder, ("type-images", ""))
+
     result = save_upload_to_supabase(file_storage, bucket, folder, prefix)
-    
+
     # Voor type-images: voeg bucket prefix toe aan het pad voor consistentie
-    if upload_folder == current_app.config["TYPE_IMAGE_UPLOAD_FOLDER"] and result:
+    if bucket == "type-images" and result:
         if not result.startswith("type-images/"):
             return f"type-images/{result}"
-    
+
     return result
 
 
@@ -205,67 +383,73 @@ def get_supabase_file_url(bucket_name: str, file_path: str) -> Optional[str]:
             return url_for('static', filename=file_path)
         return None
     
-    if not file_path or not file_path.strip():
-        print(f"Warning: Empty file_path for bucket {bucket_name}")
+    # NIEUWE LOGICA: file_path bevat alleen het pad binnen de bucket;
+    # whitespace en omringende slashes gaan er in één pass af
+    clean_path = _clean_path(file_path)
+    if clean_path is None:
+        _log.warning("Empty file_path for bucket %s", bucket_name)
         return None
-    
+
     try:
         # Als file_path al een volledige URL is, retourneer die
         if file_path.startswith("http://") or file_path.startswith("https://"):
             return file_path
-        
-        # NIEUWE LOGICA: file_path bevat alleen het pad binnen de bucket
-        # Verwijder alleen leading/trailing slashes, maar behoud de rest
-        clean_path = file_path.strip().strip('/')
-        
+
         # Verwijder bucket prefix als die per ongeluk in file_path zit (voor backward compatibility)
         # Maar alleen als het exact matcht - niet gedeeltelijk
-        known_buckets = ["Aankoop-Verkoop documenten", "Keuringsstatus", "Veiligheidsfiche", "type-images", "projects"]
-        for known_bucket in known_buckets:
-            if clean_path.startswith(f"{known_bucket}/"):
-                clean_path = clean_path[len(f"{known_bucket}/"):]
-                break
-            elif clean_path == known_bucket:
-                # Als het pad alleen de bucket naam is, is er iets mis
-                print(f"Warning: file_path is only bucket name '{clean_path}', no actual file path")
-                return None
-        
-        # URL encode speciale karakters in het pad (vooral spaties en speciale tekens)
-        # Maar behoud slashes voor folder structuur
-        from urllib.parse import quote
-        # Split op slashes, encode elk deel, en join weer
-        path_parts = clean_path.split('/')
-        encoded_parts = [quote(part, safe='') for part in path_parts]
-        encoded_path = '/'.join(encoded_parts)
-        
-        # Haal publieke URL op van Supabase
-        # Supabase SDK verwacht het pad binnen de bucket (zonder bucket prefix)
-        try:
-            response = _supabase_client.storage.from_(bucket_name).get_public_url(encoded_path)
-            print(f"DEBUG: Generated Supabase URL for bucket={bucket_name}, original_path={file_path}, clean_path={clean_path}, encoded_path={encoded_path}, URL={response}")
-            return response
-        except Exception as url_error:
-            # Als get_public_url faalt, probeer dan handmatig URL te construeren
-            print(f"Warning: get_public_url failed, constructing URL manually: {url_error}")
-            from urllib.parse import quote
-            base_url = _supabase_client.supabase_url
-            # URL encode bucket naam (voor buckets met spaties zoals "Aankoop-Verkoop documenten")
-            encoded_bucket = quote(bucket_name, safe='')
-            # Supabase public URL format: {base_url}/storage/v1/object/public/{bucket}/{path}
-            manual_url = f"{base_url}/storage/v1/object/public/{encoded_bucket}/{encoded_path}"
-            print(f"DEBUG: Manual URL constructed: bucket={bucket_name}, encoded_bucket={encoded_bucket}, path={encoded_path}, URL={manual_url}")
-            return manual_url
+        m = _BUCKET_PREFIX_RE.match(clean_path)
+        if m:
+            clean_path = clean_path[m.end():]
+        elif clean_path in _KNOWN_BUCKETS:
+            # Als het pad alleen de bucket naam is, is er iets mis
+            _log.warning("file_path is only bucket name '%s', no actual file path", clean_path)
+            return None
         
-    except Exception as e:
-        print(f"Error getting Supabase file URL for bucket={bucket_name}, path={file_path}: {e}")
-        import traceback
-        traceback.print_exc()
+        # Publieke URLs zijn stabiel zolang de bucket-configuratie niet
+        # wijzigt, dus het encoden + de SDK-call zit achter een lru_cache
+        return _build_public_url(bucket_name, clean_path)
+
+    except Exception:
+        _log.exception("Error getting Supabase file URL for bucket=%s, path=%s",
+                       bucket_name, file_path)
         # Fallback naar lokaal pad
         if file_path and file_path.startswith("uploads/"):
             return url_for('static', filename=file_path)
         return None
 
 
+@lru_cache(maxsize=4096)
+def _build_public_url(bucket_name: str, clean_path: str) -> str:
+    """
+    Bouw de publieke URL voor een (al opgeschoond) pad binnen een bucket.
+    Gememoized per (bucket, pad): een pagina met 50 documentrijen doet zo
+    maar één keer het encoden + de SDK-call per uniek bestand.
+    """
+    # Fast path: als het pad al URL-veilig is, is encoden een no-op en
+    # slaan we de quote-calls plus string-allocaties over
+    if _URL_SAFE_PATH_RE.match(clean_path):
+        encoded_path = clean_path
+    else:
+        # Split op slashes, encode elk deel, en join weer (slashes behouden
+        # voor folder structuur)
+        path_parts = clean_path.split('/')
+        encoded_parts = [quote(part, safe='') for part in path_parts]
+        encoded_path = '/'.join(encoded_parts)
+
+    # Haal publieke URL op van Supabase
+    # Supabase SDK verwacht het pad binnen de bucket (zonder bucket prefix)
+    try:
+        return _supabase_client.storage.from_(bucket_name).get_public_url(encoded_path)
+    except Exception as url_error:
+        # Als get_public_url faalt, probeer dan handmatig URL te construeren
+        _log.warning("get_public_url failed, constructing URL manually: %s", url_error)
+        base_url = _supabase_client.supabase_url
+        # URL encode bucket naam (voor buckets met spaties zoals "Aankoop-Verkoop documenten")
+        encoded_bucket = quote(bucket_name, safe='')
+        # Supabase public URL format: {base_url}/storage/v1/object/public/{bucket}/{path}
+        return f"{base_url}/storage/v1/object/public/{encoded_bucket}/{encoded_path}"
+
+
 def get_document_url(document_type: str, file_path: str) -> Optional[str]:
     """
     Centrale helper functie om document URLs te genereren.
@@ -279,9 +463,10 @@ def get_document_url(document_type: str, file_path: str) -> Optional[str]:
     Returns:
         Publieke URL of None als bestand niet bestaat
     """
-    if not file_path or not file_path.strip():
+    file_path = _clean_path(file_path)
+    if file_path is None:
         return None
-    
+
     # Bepaal bucket op basis van document type
     bucket_mapping = {
         "Aankoopfactuur": "Aankoop-Verkoop documenten",
@@ -294,9 +479,11 @@ def get_document_url(document_type: str, file_path: str) -> Optional[str]:
     # Genereer URL
     url = get_supabase_file_url(bucket, file_path)
     
-    # Debug output voor certificaten
-    if document_type == "Keuringstatus":
-        print(f"DEBUG get_document_url: document_type={document_type}, bucket={bucket}, file_path={file_path}, URL={url}")
+    # Debug output voor certificaten; de isEnabledFor-check houdt de call
+    # (en het renderen van de argumenten) volledig uit het hete pad
+    if document_type == "Keuringstatus" and _log.isEnabledFor(logging.DEBUG):
+        _log.debug("get_document_url: document_type=%s, bucket=%s, file_path=%s, URL=%s",
+                   document_type, bucket, file_path, url)
     
     return url
 
@@ -313,51 +500,31 @@ def get_file_url_from_path(file_path: str) -> Optional[str]:
     if file_path.startswith("http://") or file_path.startswith("https://"):
         return file_path
     
-    # Bepaal bucket op basis van pad
-    if file_path.startswith("docs/") or file_path.startswith("uploads/docs/"):
-        bucket = "docs"
-        # Verwijder "uploads/" prefix als die er is
-        clean_path = file_path.replace("uploads/docs/", "docs/") if "uploads/docs/" in file_path else file_path
-    elif file_path.startswith("safety/") or file_path.startswith("uploads/safety/"):
-        bucket = "safety"
-        clean_path = file_path.replace("uploads/safety/", "safety/") if "uploads/safety/" in file_path else file_path
-    elif file_path.startswith("projects/") or file_path.startswith("uploads/projects/"):
-        bucket = "projects"
-        clean_path = file_path.replace("uploads/projects/", "projects/") if "uploads/projects/" in file_path else file_path
-    elif file_path.startswith("certificates/") or file_path.startswith("uploads/certificates/"):
-        bucket = "certificates"
-        clean_path = file_path.replace("uploads/certificates/", "certificates/") if "uploads/certificates/" in file_path else file_path
-    elif file_path.startswith("type-images/") or file_path.startswith("type_images/") or file_path.startswith("uploads/type_images/"):
-        bucket = "type-images"
-        clean_path = file_path.replace("uploads/type_images/", "type-images/").replace("type_images/", "type-images/")
-    else:
-        # Als het pad geen prefix heeft, probeer te detecteren op basis van bestandstype
-        # Dit is voor backward compatibility met oude bestanden
-        if file_path.startswith("uploads/"):
-            return url_for('static', filename=file_path)
-        # Als het alleen een bestandsnaam is zonder prefix, probeer als type-image eerst
-        # (omdat dit vaak voorkomt bij materiaal types)
-        if "/" not in file_path and not file_path.startswith("uploads/"):
-            # Check of het een image extensie heeft (jpg, jpeg, png) - dan is het waarschijnlijk een type-image
-            image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-            if any(file_path.lower().endswith(ext) for ext in image_extensions):
-                bucket = "type-images"
-                clean_path = file_path
-            else:
-                # Anders probeer als project image (verwijder "projects/" als die er al in zit)
-                bucket = "projects"
-                clean_path = file_path.replace("projects/", "") if file_path.startswith("projects/") else file_path
-        else:
-            return None
-    
-    return get_supabase_file_url(bucket, clean_path)
+    # Bepaal bucket op basis van pad via de prefix-tabel (één pass in plaats
+    # van de oude if/elif-keten met replace-allocaties per branch)
+    for prefix, bucket, new_prefix in _PATH_PREFIX_MAP:
+        if file_path.startswith(prefix):
+            clean_path = file_path if new_prefix is None else new_prefix + file_path[len(prefix):]
+            return get_supabase_file_url(bucket, clean_path)
+
+    # Als het pad geen prefix heeft, probeer te detecteren op basis van bestandstype
+    # Dit is voor backward compatibility met oude bestanden
+    if file_path.startswith("uploads/"):
+        return url_for('static', filename=file_path)
+    # Als het alleen een bestandsnaam is zonder prefix, probeer als type-image eerst
+    # (omdat dit vaak voorkomt bij materiaal types)
+    if "/" not in file_path:
+        # Check of het een image extensie heeft (jpg, jpeg, png) - dan is het
+        # waarschijnlijk een type-image; alleen de extensie wordt gelowercased
+        if os.path.splitext(file_path)[1].lower() in _IMAGE_EXTS:
+            return get_supabase_file_url("type-images", file_path)
+        # Anders probeer als project image
+        return get_supabase_file_url("projects", file_path)
+    return None
 
 
 def login_required(view):
     """Decorator to require login for a route"""
-    from functools import wraps
-    from flask import redirect, url_for, request, session
-    
     @wraps(view)
     def wrapped(*args, **kwargs):
         if session.get("user_email") is None:
@@ -371,13 +538,54 @@ def login_required(view):
     return wrapped
 
 
+# Kleine TTL-cache voor de email->id fallback in load_current_user; wordt
+# alleen geraakt door sessies van vóór session["user_id"]
+_EMAIL_CACHE_TTL = 30.0  # seconden
+_EMAIL_CACHE_MAX = 1024
+_email_to_id_cache: dict = {}
+_email_cache_lock = threading.RLock()
+
+
+def resolve_user_id_by_email(email: str) -> Optional[int]:
+    """Zoek een gebruiker-id op email, met een korte TTL-cache per worker."""
+    now = time.monotonic()
+    with _email_cache_lock:
+        entry = _email_to_id_cache.get(email)
+        if entry is not None and now - entry[1] < _EMAIL_CACHE_TTL:
+            return entry[0]
+
+    user_id = db.session.query(Gebruiker.gebruiker_id).filter_by(email=email).scalar()
+
+    with _email_cache_lock:
+        if len(_email_to_id_cache) >= _EMAIL_CACHE_MAX:
+            _email_to_id_cache.clear()
+        _email_to_id_cache[email] = (user_id, now)
+    return user_id
+
+
+def invalidate_user_cache(email: Optional[str]):
+    """Verwijder een email uit de TTL-cache (bv. bij logout of accountwijziging)."""
+    if not email:
+        return
+    with _email_cache_lock:
+        _email_to_id_cache.pop(email, None)
+
+
 def load_current_user():
-    """Load current user from session"""
+    """Load current user from session (PK-lookup, zie app.load_current_user)"""
     g.user = None
     email = session.get("user_email")
     if not email:
         return
-    g.user = Gebruiker.query.filter_by(email=email).first()
+    user_id = session.get("user_id")
+    if user_id is None:
+        # Oude sessies: email->id via de TTL-cache, daarna staat het id
+        # in de sessie en is elke volgende request een PK-lookup
+        user_id = resolve_user_id_by_email(email)
+        if user_id is None:
+            return
+        session["user_id"] = user_id
+    g.user = db.session.get(Gebruiker, user_id)
 
 
 def delete_file_from_supabase(bucket_name: str, file_path: str) -> bool:
@@ -392,24 +600,21 @@ def delete_file_from_supabase(bucket_name: str, file_path: str) -> bool:
         True als verwijdering succesvol is, False anders
     """
     if not _supabase_client:
-        print(f"Warning: Supabase client niet beschikbaar, kan bestand niet verwijderen uit bucket '{bucket_name}'")
+        _log.warning("Supabase client niet beschikbaar, kan bestand niet verwijderen uit bucket '%s'", bucket_name)
         return False
     
-    if not file_path or not file_path.strip():
-        print(f"Warning: Leeg file_path, kan bestand niet verwijderen uit bucket '{bucket_name}'")
+    clean_path = _clean_path(file_path)
+    if clean_path is None:
+        _log.warning("Leeg file_path, kan bestand niet verwijderen uit bucket '%s'", bucket_name)
         return False
-    
+
     try:
         # Verwijder bucket prefix als die per ongeluk in file_path zit
-        clean_path = file_path.strip().strip('/')
-        known_buckets = ["Aankoop-Verkoop documenten", "Keuringsstatus", "Veiligheidsfiche", "type-images", "projects"]
-        for known_bucket in known_buckets:
-            if clean_path.startswith(f"{known_bucket}/"):
-                clean_path = clean_path[len(f"{known_bucket}/"):]
-                break
+        m = _BUCKET_PREFIX_RE.match(clean_path)
+        if m:
+            clean_path = clean_path[m.end():]
         
         # URL encode speciale karakters in het pad
-        from urllib.parse import quote
         path_parts = clean_path.split('/')
         encoded_parts = [quote(part, safe='') for part in path_parts]
         encoded_path = '/'.join(encoded_parts)
@@ -420,33 +625,137 @@ def delete_file_from_supabase(bucket_name: str, file_path: str) -> bool:
         # Supabase remove geeft een lijst terug met verwijderde bestanden
         # Als het bestand succesvol verwijderd is, staat het in de response
         if response and len(response) > 0:
-            print(f"Successfully deleted file from bucket '{bucket_name}': {encoded_path}")
+            _log.info("Successfully deleted file from bucket '%s': %s", bucket_name, encoded_path)
             return True
         else:
-            print(f"Warning: Geen response van Supabase remove voor bucket '{bucket_name}', path '{encoded_path}'")
+            _log.warning("Geen response van Supabase remove voor bucket '%s', path '%s'",
+                         bucket_name, encoded_path)
             # Probeer toch True te retourneren als er geen error was
             return True
             
-    except Exception as e:
-        print(f"Error deleting file from Supabase Storage bucket '{bucket_name}', path '{file_path}': {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        _log.exception("Error deleting file from Supabase Storage bucket '%s', path '%s'",
+                       bucket_name, file_path)
         return False
 
 
-def log_activity_db(action: str, name: str, serial: str):
-    """Schrijf een activiteit weg naar de activiteiten_log tabel in Supabase."""
+# Buffer voor de activiteiten-log: rijen worden hier verzameld en door een
+# achtergrond-thread in batches weggeschreven, zodat een request niet per
+# logregel op een commit (round trip + WAL fsync) hoeft te wachten
+_activity_queue: deque = deque()
+_activity_lock = threading.Lock()
+_activity_flusher: Optional[threading.Thread] = None
+
+_ACTIVITY_FLUSH_INTERVAL = 0.5  # seconden tussen flushes
+_ACTIVITY_FLUSH_BATCH = 200     # max rijen per flush
+
+
+def _flush_activities(app):
+    """Schrijf de gebufferde activiteiten in één bulk-INSERT weg."""
+    with _activity_lock:
+        if not _activity_queue:
+            return
+        rows = [
+            _activity_queue.popleft()
+            for _ in range(min(len(_activity_queue), _ACTIVITY_FLUSH_BATCH))
+        ]
+
+    with app.app_context():
+        try:
+            db.session.execute(insert(Activity), rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            _log.error("Error flushing activiteiten-log (%d rijen): %s", len(rows), e)
+        finally:
+            db.session.remove()
+
+
+def _drain_activity_queue(app):
+    while True:
+        time.sleep(_ACTIVITY_FLUSH_INTERVAL)
+        _flush_activities(app)
+
+
+def init_activity_flusher(app):
+    """
+    Start de achtergrond-flusher voor de activiteiten-log en registreer een
+    atexit-hook zodat de buffer bij shutdown nog wordt weggeschreven.
+    """
+    global _activity_flusher
+    if _activity_flusher is not None:
+        return
+    _activity_flusher = threading.Thread(
+        target=_drain_activity_queue, args=(app,), daemon=True, name="activity-flush"
+    )
+    _activity_flusher.start()
+    atexit.register(_flush_activities, app)
+
+
+def log_activity_db(action: str, name: str, serial: str, commit: bool = True, sync: bool = False):
+    """
+    Schrijf een activiteit weg naar de activiteiten_log tabel in Supabase.
+
+    Standaard wordt de rij gebufferd en door de achtergrond-flusher in een
+    batch gecommit (geen round trip in de request). Met sync=True wordt
+    direct gecommit (voor acties die de log gegarandeerd nodig hebben);
+    met commit=False wordt alleen ge-add en bepaalt de caller de
+    transactiegrens.
+    """
     user_name = None
     if getattr(g, "user", None) and g.user.naam:
         user_name = g.user.naam
 
-    act = Activity(
-        action=action,
-        name=name or "",
-        serial=serial or "",
-        user_name=user_name or "Onbekend",
-        created_at=datetime.utcnow(),
-    )
-    db.session.add(act)
+    row = {
+        "action": action,
+        "name": name or "",
+        "serial": serial or "",
+        "user_name": user_name or "Onbekend",
+    }
+
+    if sync or not commit:
+        # Core INSERT: geen ORM-instantie, geen RETURNING/identity-map —
+        # de logrij wordt nooit teruggelezen
+        db.session.execute(insert(Activity), row)
+        if commit:
+            db.session.commit()
+        return
+
+    if _activity_flusher is None:
+        # Flusher niet gestart (bv. losse scripts): val terug op direct committen
+        db.session.execute(insert(Activity), row)
+        db.session.commit()
+        return
+
+    with _activity_lock:
+        _activity_queue.append(row)
+
+
+def log_activities_bulk(rows: list[dict]):
+    """
+    Schrijf meerdere activiteiten in één multi-values INSERT weg.
+
+    rows: lijst van dicts met 'action', 'name' en 'serial' keys.
+    Gebruiker wordt hier één keer ingevuld; de timestamp komt uit de
+    database-default (now()). Vermijdt O(N) commits/round trips wanneer
+    een route veel activiteiten logt.
+    """
+    if not rows:
+        return
+
+    user_name = None
+    if getattr(g, "user", None) and g.user.naam:
+        user_name = g.user.naam
+
+    mappings = [
+        {
+            "action": row.get("action") or "",
+            "name": row.get("name") or "",
+            "serial": row.get("serial") or "",
+            "user_name": user_name or "Onbekend",
+        }
+        for row in rows
+    ]
+    db.session.execute(insert(Activity), mappings)
     db.session.commit()
 
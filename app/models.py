@@ -1,5 +1,4 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
 from sqlalchemy.orm import relationship
 
 db = SQLAlchemy()
@@ -9,7 +8,7 @@ class Gebruiker(db.Model):
     __tablename__ = "gebruikers"
 
     gebruiker_id = db.Column(db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now())
 
     naam = db.Column("naam", db.String)
     email = db.Column("email", db.String, unique=True, nullable=False)
@@ -22,63 +21,20 @@ class Gebruiker(db.Model):
         nullable=True
     )
 
-    telefoonnummer = db.Column("telefoonnummer", db.Numeric, nullable=True)
+    # Tekst, geen Numeric: telefoonnummers zijn geen rekenwaarden en een
+    # NUMERIC wordt client-side als (traag) Decimal gedecodeerd
+    telefoonnummer = db.Column("telefoonnummer", db.String(32), nullable=True)
     wachtwoord_hash = db.Column("wachtwoord_hash", db.String, nullable=True)
 
     # Admin status voor beheerfuncties
-    is_admin = db.Column(db.Boolean, default=False)
+    is_admin = db.Column(db.Boolean, default=False, server_default=db.text("false"))
     
-    # Relationships
-    project = db.relationship("Project", backref="gebruikers", foreign_keys=[werf_id])
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
-    
-    @property
-    def Naam(self):
-        return self.naam
-    
-    @Naam.setter
-    def Naam(self, value):
-        self.naam = value
-    
-    @property
-    def Email(self):
-        return self.email
-    
-    @Email.setter
-    def Email(self, value):
-        self.email = value
-    
-    @property
-    def Functie(self):
-        return self.functie
-    
-    @Functie.setter
-    def Functie(self, value):
-        self.functie = value
-    
-    @property
-    def project_id(self):
-        return self.werf_id
-    
-    @project_id.setter
-    def project_id(self, value):
-        self.werf_id = value
-    
-    @property
-    def password_hash(self):
-        return self.wachtwoord_hash
-    
-    @password_hash.setter
-    def password_hash(self, value):
-        self.wachtwoord_hash = value
+    # Relationships (expliciete back_populates-paren zodat beide kanten
+    # hun eigen laadstrategie dragen in plaats van een impliciete backref)
+    project = db.relationship("Project", back_populates="gebruikers", foreign_keys=[werf_id])
+    activities = db.relationship("Activity", back_populates="user", foreign_keys="Activity.user_id")
+    usages = db.relationship("MaterialUsage", back_populates="user")
+    documents = db.relationship("Document", back_populates="user")
 
 
 class Project(db.Model):
@@ -89,7 +45,7 @@ class Project(db.Model):
     __tablename__ = "werven"
 
     id = db.Column("project_id", db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now())
 
     name = db.Column("naam", db.String, nullable=True)
     address = db.Column("adres", db.String, nullable=True)
@@ -100,23 +56,28 @@ class Project(db.Model):
 
     image_url = db.Column("afbeelding_url", db.Text, nullable=True)
     note = db.Column("opmerking", db.Text, nullable=True)
-    is_deleted = db.Column("is_verwijderd", db.Boolean, default=False)
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
+    is_deleted = db.Column("is_verwijderd", db.Boolean, default=False, server_default=db.text("false"))
+
+    # Relationships
+    gebruikers = db.relationship("Gebruiker", back_populates="project", foreign_keys="Gebruiker.werf_id")
+    materials = db.relationship("Material", back_populates="project", foreign_keys="Material.werf_id")
+    material_usages = db.relationship("MaterialUsage", back_populates="project")
+
+
+# Partial index voor de werf-dropdowns en lijsten: vrijwel elke query
+# filtert op is_verwijderd = false en sorteert op naam
+db.Index(
+    "ix_werven_actief_naam",
+    Project.name,
+    postgresql_where=db.text('NOT "is_verwijderd"'),
+)
 
 
 class Material(db.Model):
     __tablename__ = "materialen"
 
     id = db.Column(db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now())
 
     name = db.Column("naam", db.String)
     status = db.Column("status", db.String)
@@ -126,7 +87,8 @@ class Material(db.Model):
         "keuring_id",
         db.BigInteger,
         db.ForeignKey("keuring_status.id", ondelete="SET NULL"),
-        nullable=True
+        nullable=True,
+        index=True,
     )
 
     # Foreign key to Project (werven)
@@ -134,77 +96,89 @@ class Material(db.Model):
         "werf_id",
         db.BigInteger,
         db.ForeignKey("werven.project_id", ondelete="SET NULL"),
-        nullable=True
+        nullable=True,
+        index=True,
     )
 
     serial = db.Column("serienummer", db.String, unique=True, nullable=False)
-    
+
     # Foreign key to MaterialType
     material_type_id = db.Column(
         "materiaal_type_id",
         db.BigInteger,
         db.ForeignKey("materiaal_types.id", ondelete="SET NULL"),
-        nullable=True
+        nullable=True,
+        index=True,
     )
     type = db.Column("type", db.String)              # "type" (legacy string field, kept for backward compatibility)
 
     purchase_date = db.Column("aankoop_datum", db.Date, nullable=True)
     assigned_to = db.Column("toegewezen_aan", db.String, nullable=True)  # Denormalized user name (not FK - for display/historical purposes)
     site = db.Column("locatie", db.String, nullable=True)
-    note = db.Column("opmerking", db.String, nullable=True)
 
-    documentation_path = db.Column("documentatie_pad", db.Text, nullable=True)
+    # Koude kolommen: de lijst-template en de meeste routes lezen deze
+    # nooit, alleen de zoek-API (die undefer't) en de detail/edit-routes.
+    # deferred houdt de brede tekstvelden uit elke standaard-SELECT.
+    note = db.orm.deferred(db.Column("opmerking", db.String, nullable=True))
+    documentation_path = db.orm.deferred(db.Column("documentatie_pad", db.Text, nullable=True))
 
     nummer_op_materieel = db.Column("nummer_op_materieel", db.String, nullable=True)
     inspection_status = db.Column("keuring_status", db.String, nullable=True)
     laatste_keuring = db.Column("laatste_keuring", db.Date, nullable=True)
-    is_deleted = db.Column("is_verwijderd", db.Boolean, default=False, nullable=False)
+    is_deleted = db.Column("is_verwijderd", db.Boolean, default=False, nullable=False, server_default=db.text("false"))
 
     # Relationships with optimized lazy loading
     project = db.relationship(
         "Project",
-        backref="materials",
+        back_populates="materials",
         foreign_keys=[werf_id],
-        lazy="select",
+        lazy="selectin",
     )
-    
+
     # Relationship to Keuringstatus via keuring_id
     keuring = db.relationship(
         "Keuringstatus",
-        backref="materials",
+        back_populates="materials",
         foreign_keys=[keuring_id],
         uselist=False,  # One-to-one relationship
-        lazy="select",
+        lazy="selectin",
     )
-    
+
     # Relationship to MaterialType via material_type_id
     material_type = db.relationship(
         "MaterialType",
-        backref="materials",
+        back_populates="materials",
         foreign_keys=[material_type_id],
-        lazy="select",
+        lazy="selectin",
     )
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
-    
-    @property
-    def project_id(self):
-        return self.werf_id  # Alias voor werf_id
-    
-    @project_id.setter
-    def project_id(self, value):
-        self.werf_id = value
+
+    # Collecties (voorheen impliciete backrefs op de andere kant)
+    usages = db.relationship("MaterialUsage", back_populates="material")
+    documents = db.relationship("Document", back_populates="material")
+    keuring_historiek = db.relationship("KeuringHistoriek", back_populates="material")
+
+
+# Functionele index zodat case-insensitieve serienummer-lookups
+# (bv. handmatig ingetikte serienummers) een index scan blijven
+db.Index("ix_materialen_serienummer_lower", db.func.lower(Material.serial))
+
+# Partial index voor de materiaallijst: filtert op niet-verwijderd
+# (false óf NULL in bestaande data) en sorteert op naam
+db.Index(
+    "ix_materialen_actief_naam",
+    Material.name,
+    postgresql_where=db.text('("is_verwijderd" = false OR "is_verwijderd" IS NULL)'),
+)
+
+# Partial index voor de "te keuren"-teller op het dashboard: telt alleen
+# de twee statussen die aandacht vragen
+db.Index(
+    "ix_materialen_te_keuren",
+    Material.inspection_status,
+    postgresql_where=db.text(
+        "\"keuring_status\" IN ('keuring verlopen', 'keuring gepland')"
+    ),
+)
 
 
 class Activity(db.Model):
@@ -212,38 +186,34 @@ class Activity(db.Model):
     Map naar Supabase tabel 'activiteiten_log'
     """
     __tablename__ = "activiteiten_log"
+    __table_args__ = (
+        # Historiek per serienummer, nieuwste eerst (geschiedenis pagina)
+        db.Index("ix_activiteiten_log_serienummer_aangemaakt", "serienummer", "aangemaakt_op"),
+    )
 
     id = db.Column(db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now(), index=True)
     action = db.Column("actie", db.String)
     name = db.Column("naam", db.String)
     serial = db.Column("serienummer", db.String)
     user_name = db.Column("gebruiker_naam", db.String)  # Denormalized user name (for historical reference)
-    
+
     # Foreign key to Gebruiker - links activity to user
     user_id = db.Column(
         "gebruiker_id",
         db.BigInteger,
         db.ForeignKey("gebruikers.gebruiker_id", ondelete="SET NULL"),
         nullable=True,
+        index=True,
     )
     
     # Relationship to Gebruiker
     user = db.relationship(
         "Gebruiker",
-        backref="activities",
+        back_populates="activities",
         foreign_keys=[user_id],
-        lazy="select",
+        lazy="selectin",
     )
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
 
 
 class MaterialUsage(db.Model):
@@ -259,15 +229,19 @@ class MaterialUsage(db.Model):
         db.BigInteger,
         db.ForeignKey("materialen.id", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     user_id = db.Column(
         "gebruiker_id",
         db.BigInteger,
         db.ForeignKey("gebruikers.gebruiker_id", ondelete="SET NULL"),
         nullable=True,
+        index=True,
     )
 
     # Foreign key to Project (werven)
+    # Actieve-usage lookups op werf lopen via de partial index
+    # ix_materiaal_gebruik_werf_actief (zie DDL MODEL.sql)
     project_id = db.Column(
         "werf_id",
         db.BigInteger,
@@ -277,30 +251,39 @@ class MaterialUsage(db.Model):
 
     site = db.Column("locatie", db.Text, nullable=True)
     note = db.Column("opmerking", db.Text, nullable=True)
-    start_time = db.Column("start_tijd", db.DateTime(timezone=True), default=datetime.utcnow)
+    start_time = db.Column("start_tijd", db.DateTime(timezone=True), server_default=db.func.now())
     end_time = db.Column("eind_tijd", db.DateTime(timezone=True), nullable=True)
-    is_active = db.Column("is_actief", db.Boolean, default=True)
+    is_active = db.Column("is_actief", db.Boolean, default=True, server_default=db.text("true"))
     used_by = db.Column("gebruikt_door", db.Text, nullable=True)
 
     # Relationships with optimized lazy loading
-    material = db.relationship("Material", backref="usages", lazy="select")
-    user = db.relationship("Gebruiker", backref="usages", lazy="select")
+    material = db.relationship("Material", back_populates="usages", lazy="selectin")
+    user = db.relationship("Gebruiker", back_populates="usages", lazy="selectin")
 
     # Relationship to Project
     project = db.relationship(
         "Project",
-        backref="material_usages",
-        lazy="select",
+        back_populates="material_usages",
+        lazy="selectin",
     )
-    
-    # Backward compatibility properties
-    @property
-    def materiaal_id(self):
-        return self.material_id
-    
-    @property
-    def gebruiker_id(self):
-        return self.user_id
+
+
+# Huidige gebruiker van een materiaal als gecorreleerde subquery, berekend
+# in de hoofd-SELECT zelf (via de partial index op actieve usages) in
+# plaats van material.usages af te lopen in Python. deferred: lijstqueries
+# betalen er niets voor tenzij ze expliciet undefer(Material.current_used_by)
+# meegeven of het attribuut aanraken.
+Material.current_used_by = db.orm.column_property(
+    db.select(MaterialUsage.used_by)
+    .where(
+        MaterialUsage.material_id == Material.id,
+        MaterialUsage.is_active.is_(True),
+    )
+    .limit(1)
+    .correlate_except(MaterialUsage)
+    .scalar_subquery(),
+    deferred=True,
+)
 
 
 class Keuringstatus(db.Model):
@@ -310,27 +293,17 @@ class Keuringstatus(db.Model):
     __tablename__ = "keuring_status"
 
     id = db.Column(db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now())
     
     laatste_controle = db.Column("laatste_controle", db.Date, nullable=True)
     volgende_controle = db.Column("volgende_controle", db.Date, nullable=True)
-    serienummer = db.Column("serienummer", db.String, nullable=True)
+    serienummer = db.Column("serienummer", db.String, nullable=True, index=True)
     uitgevoerd_door = db.Column("uitgevoerd_door", db.String, nullable=True)
     opmerkingen = db.Column("opmerkingen", db.Text, nullable=True)
     updated_by = db.Column("updated_by", db.BigInteger, nullable=True)
     
-    # Relationships
-    # Note: Material relationship is via keuring_id FK in Material model
-    # This is a reverse relationship - materials reference this keuring
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
+    # Relationships: materialen verwijzen naar deze keuring via keuring_id
+    materials = db.relationship("Material", back_populates="keuring", foreign_keys="Material.keuring_id")
 
 
 class KeuringHistoriek(db.Model):
@@ -341,17 +314,21 @@ class KeuringHistoriek(db.Model):
     Elke keer dat een keuring wordt uitgevoerd, wordt hier een record aangemaakt.
     """
     __tablename__ = "keuring_historiek"
+    __table_args__ = (
+        # Keuringshistoriek per materiaal op datum (detail pagina's)
+        db.Index("ix_keuring_historiek_materiaal_datum", "materiaal_id", "keuring_datum"),
+    )
 
     id = db.Column(db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
-    
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now())
+
     material_id = db.Column(
         "materiaal_id",
         db.BigInteger,
         db.ForeignKey("materialen.id", ondelete="CASCADE"),
         nullable=False,
     )
-    serienummer = db.Column(db.String, nullable=False)
+    serienummer = db.Column(db.String, nullable=False, index=True)
     
     keuring_datum = db.Column("keuring_datum", db.Date, nullable=False)
     resultaat = db.Column(db.String, nullable=False)  # 'goedgekeurd', 'afgekeurd', 'voorwaardelijk'
@@ -362,16 +339,7 @@ class KeuringHistoriek(db.Model):
     certificaat_path = db.Column("certificaat_pad", db.Text, nullable=True)
     
     # Relatie naar Material
-    material = db.relationship("Material", backref="keuring_historiek", lazy="select")
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
+    material = db.relationship("Material", back_populates="keuring_historiek", lazy="selectin")
 
 
 class Document(db.Model):
@@ -384,20 +352,21 @@ class Document(db.Model):
     __tablename__ = "documenten"
 
     id = db.Column(db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now())
     
-    document_type = db.Column("document_type", db.String, nullable=False)  # Document type as string (e.g., "Aankoopfactuur", "Veiligheidsfiche")
+    document_type = db.Column("document_type", db.String, nullable=False, index=True)  # Document type as string (e.g., "Aankoopfactuur", "Veiligheidsfiche")
     file_path = db.Column("bestand_pad", db.Text, nullable=False)
     file_name = db.Column("bestand_naam", db.Text, nullable=False)
     file_size = db.Column("bestand_grootte", db.BigInteger, nullable=True)
-    
+
     material_id = db.Column(
         "materiaal_id",
         db.BigInteger,
         db.ForeignKey("materialen.id", ondelete="SET NULL"),
         nullable=True,
+        index=True,
     )
-    
+
     # Link to MaterialType (proper FK instead of string)
     # Can link to EITHER a specific Material (via material_id) OR a MaterialType (via material_type_id)
     material_type_id = db.Column(
@@ -405,6 +374,7 @@ class Document(db.Model):
         db.BigInteger,
         db.ForeignKey("materiaal_types.id", ondelete="SET NULL"),
         nullable=True,
+        index=True,
     )
     
     # Legacy: keep material_type as string for backward compatibility during migration
@@ -422,19 +392,10 @@ class Document(db.Model):
     note = db.Column("opmerking", db.Text, nullable=True)
     
     # Relationships with optimized lazy loading
-    material = db.relationship("Material", backref="documents", lazy="select")
-    material_type_ref = db.relationship("MaterialType", backref="documents", lazy="select", foreign_keys=[material_type_id])
-    user = db.relationship("Gebruiker", backref="documents", lazy="select")
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
-    
+    material = db.relationship("Material", back_populates="documents", lazy="selectin")
+    material_type_ref = db.relationship("MaterialType", back_populates="documents", lazy="selectin", foreign_keys=[material_type_id])
+    user = db.relationship("Gebruiker", back_populates="documents", lazy="selectin")
+
     @property
     def linked_entity(self):
         """Return the linked entity (Material or MaterialType)"""
@@ -464,21 +425,13 @@ class MaterialType(db.Model):
     __tablename__ = "materiaal_types"
     
     id = db.Column(db.BigInteger, primary_key=True)
-    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), default=datetime.utcnow)
+    aangemaakt_op = db.Column("aangemaakt_op", db.DateTime(timezone=True), server_default=db.func.now())
     name = db.Column("naam", db.String, nullable=False, unique=True)  # De naam van het materiaal type (bijv. "Boormachine")
     description = db.Column("beschrijving", db.Text, nullable=True)
     inspection_validity_days = db.Column("keuring_geldigheid_dagen", db.Integer, nullable=True)
     type_image = db.Column("type_afbeelding", db.Text, nullable=True)  # Pad naar type afbeelding
     safety_sheet = db.Column("veiligheidsfiche", db.Text, nullable=True)  # Pad naar veiligheidsfiche
     
-    # Relationship with Material (backref defined in Material model)
-    # Materials can reference MaterialType via material_type_id FK
-    
-    # Backward compatibility properties
-    @property
-    def created_at(self):
-        return self.aangemaakt_op
-    
-    @created_at.setter
-    def created_at(self, value):
-        self.aangemaakt_op = value
\ No newline at end of file
+    # Relationships: materialen en documenten die naar dit type verwijzen
+    materials = db.relationship("Material", back_populates="material_type", foreign_keys="Material.material_type_id")
+    documents = db.relationship("Document", back_populates="material_type_ref", foreign_keys="Document.material_type_id")
\ No newline at end of file
@@ -9,11 +9,15 @@ from models import (
     db, Material, MaterialUsage, Project, Keuringstatus, 
     KeuringHistoriek, MaterialType, Activity, Gebruiker
 )
-from sqlalchemy import or_, func, and_, case
+from sqlalchemy import or_, func, and_, case, select, update
+from cache import cache
 from constants import (
     DEFAULT_INSPECTION_STATUS, VALID_INSPECTION_STATUSES,
     VALID_USAGE_STATUSES
 )
+import logging
+
+_log = logging.getLogger(__name__)
 
 
 class MaterialService:
@@ -24,10 +28,11 @@ class MaterialService:
         """Find material by serial number (excludes deleted materials)"""
         if not serial:
             return None
-        # SQLAlchemy mapt automatisch de Python attribuut 'serial' naar de database kolom 'serienummer'
-        # Gebruik filter() met == voor betere compatibiliteit
+        # Case-insensitief: handmatig ingetikte serienummers verschillen
+        # geregeld in hoofdlettergebruik. De functionele index
+        # ix_materialen_serienummer_lower houdt dit een index scan.
         return Material.query.filter(
-            Material.serial == serial,
+            func.lower(Material.serial) == serial.strip().lower(),
             or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None))
         ).first()
     
@@ -47,14 +52,19 @@ class MaterialService:
             ).first()
         return item
     
+    # De tellers hieronder zijn dashboard-statistieken: read-heavy en een
+    # halve minuut staleness is daar acceptabel, dus een korte memoize-TTL
+    # bespaart een count(*)-scan per pageview
     @staticmethod
+    @cache.memoize(timeout=30)
     def get_total_count() -> int:
         """Get total count of active (non-deleted) materials"""
         return Material.query.filter(
             or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None))
         ).count()
-    
+
     @staticmethod
+    @cache.memoize(timeout=30)
     def get_in_use_count() -> int:
         """Get count of materials currently in use"""
         return (
@@ -62,8 +72,9 @@ class MaterialService:
             .filter(MaterialUsage.is_active.is_(True))
             .scalar()
         ) or 0
-    
+
     @staticmethod
+    @cache.memoize(timeout=30)
     def get_to_inspect_count() -> int:
         """Get count of materials requiring inspection (status: 'keuring verlopen' OR 'keuring gepland')"""
         return Material.query.filter(
@@ -118,112 +129,84 @@ class MaterialService:
         """
         today = datetime.utcnow().date()
         updated_count = 0
-        
-        # PART 1: Get keuringen with expired dates
-        # Update alleen materialen waarvan inspection_status == "goedgekeurd"
-        keuringen_met_verlopen_datum = Keuringstatus.query.filter(
-            Keuringstatus.volgende_controle.isnot(None),
-            Keuringstatus.volgende_controle < today,
-            Keuringstatus.laatste_controle.is_(None)
-        ).all()
-        
-        if keuringen_met_verlopen_datum:
-            # Collect all serial numbers for batch lookup
-            serials = [k.serienummer for k in keuringen_met_verlopen_datum if k.serienummer]
-            
-            if serials:
-                # Single query to get all materials by serial numbers
-                # ALLEEN materialen met status "goedgekeurd" - alle andere statussen blijven onaangeroerd
-                materials = Material.query.filter(
-                    Material.serial.in_(serials),
-                    Material.inspection_status == "goedgekeurd"  # Alleen "goedgekeurd" mag worden aangepast
-                ).all()
-                
-                # Create a map of serial -> material for O(1) lookup
-                material_map = {m.serial: m for m in materials}
-                
-                # Update materials that need updating
-                for keuring in keuringen_met_verlopen_datum:
-                    if not keuring.serienummer:
-                        continue
-                    
-                    material = material_map.get(keuring.serienummer)
-                    if material:
-                        # Extra veiligheidscheck: alleen updaten als status nog steeds "goedgekeurd" is
-                        # Dit voorkomt race conditions en zorgt voor idempotentie
-                        if material.inspection_status == "goedgekeurd":
-                            material.inspection_status = "keuring verlopen"
-                            updated_count += 1
-        
-        # PART 2: Check materials with laatste_keuring/purchase_date + keuring_geldigheid_dagen
-        # Get materials that have:
-        # - Either laatste_keuring OR purchase_date (fallback)
-        # - material_type_id is set
-        # - Status is exactly "goedgekeurd" (ALLEEN "goedgekeurd" mag worden aangepast)
-        # - Not deleted
-        materials_to_check = (
-            Material.query
-            .filter(
-                or_(
-                    Material.laatste_keuring.isnot(None),
-                    Material.purchase_date.isnot(None)  # Include materials with purchase_date as fallback
-                ),
-                Material.material_type_id.isnot(None),
-                Material.inspection_status == "goedgekeurd",  # ALLEEN "goedgekeurd" - andere statussen blijven behouden
-                or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None))
+
+        # Deze functie draait bij elk bezoek aan /materiaal; in plaats van
+        # alle kandidaat-rijen te hydrateren en per rij te muteren (N
+        # UPDATEs via dirty tracking) doen we drie set-based UPDATEs die
+        # volledig in de database uitgevoerd worden.
+
+        # PART 1: materialen waarvan de gekoppelde keuring verlopen is
+        # (volgende_controle in het verleden, nog geen laatste_controle).
+        # ALLEEN "goedgekeurd" mag worden aangepast - alle andere statussen
+        # ("afgekeurd", "onder voorbehoud", ...) blijven onaangeroerd.
+        verlopen_serials = (
+            select(Keuringstatus.serienummer)
+            .where(
+                Keuringstatus.volgende_controle.isnot(None),
+                Keuringstatus.volgende_controle < today,
+                Keuringstatus.laatste_controle.is_(None),
+                Keuringstatus.serienummer.isnot(None),
             )
-            .all()
         )
-        
-        # Eager load material_type relationships to avoid N+1 queries
-        material_type_ids = {m.material_type_id for m in materials_to_check if m.material_type_id}
-        if material_type_ids:
-            # Pre-load all material types with validity days > 0
-            material_types = MaterialType.query.filter(
-                MaterialType.id.in_(material_type_ids),
+        result = db.session.execute(
+            update(Material)
+            .where(
+                Material.inspection_status == "goedgekeurd",
+                Material.serial.in_(verlopen_serials),
+            )
+            .values(inspection_status="keuring verlopen")
+            .execution_options(synchronize_session=False)
+        )
+        updated_count += result.rowcount or 0
+
+        # Geldigheid (in dagen) van het gekoppelde type als gecorreleerde
+        # subquery; types zonder (positieve) geldigheid geven NULL en
+        # vallen zo vanzelf buiten de WHERE-clausules hieronder
+        validity_days = (
+            select(MaterialType.inspection_validity_days)
+            .where(
+                MaterialType.id == Material.material_type_id,
                 MaterialType.inspection_validity_days.isnot(None),
-                MaterialType.inspection_validity_days > 0
-            ).all()
-            material_type_map = {mt.id: mt for mt in material_types}
-            
-            # Check each material
-            for material in materials_to_check:
-                # Skip if material_type_id is missing
-                if not material.material_type_id:
-                    continue
-                
-                # Skip if material_type is missing or has no validity days
-                material_type = material_type_map.get(material.material_type_id)
-                if not material_type or not material_type.inspection_validity_days or material_type.inspection_validity_days <= 0:
-                    continue
-                
-                # Determine base date: use laatste_keuring if available, otherwise fallback to purchase_date
-                base_date = material.laatste_keuring or material.purchase_date
-                
-                # Skip if both dates are missing (edge case)
-                if not base_date:
-                    continue
-                
-                # Optional: Fill in laatste_keuring with purchase_date for consistency
-                # Only when laatste_keuring is missing and purchase_date exists
-                # Dit overschrijft GEEN statussen (behalve "goedgekeurd" → "keuring verlopen" hieronder)
-                if not material.laatste_keuring and material.purchase_date:
-                    material.laatste_keuring = material.purchase_date
-                    # Note: We don't count this as an "update" for updated_count
-                    # Only status changes are counted
-                
-                # Calculate expiry_date = base_date + validity_days
-                expiry_date = base_date + timedelta(days=material_type.inspection_validity_days)
-                
-                # If today > expiry_date and status is "goedgekeurd", set to "keuring verlopen"
-                if today > expiry_date:
-                    # Double-check status is still "goedgekeurd" (idempotent check + extra veiligheid)
-                    # Als status al "keuring verlopen" is, doe niets (idempotent)
-                    # Als status iets anders is ("afgekeurd", "onder voorbehoud", etc.), blijf ongemoeid
-                    if material.inspection_status == "goedgekeurd":
-                        material.inspection_status = "keuring verlopen"
-                        updated_count += 1
-        
+                MaterialType.inspection_validity_days > 0,
+            )
+            .scalar_subquery()
+        )
+
+        # PART 2a: laatste_keuring invullen met purchase_date voor
+        # consistentie (zelfde kandidaatset als de verloopcheck hieronder;
+        # telt niet mee in updated_count, alleen statuswijzigingen tellen)
+        db.session.execute(
+            update(Material)
+            .where(
+                Material.laatste_keuring.is_(None),
+                Material.purchase_date.isnot(None),
+                Material.material_type_id.isnot(None),
+                Material.inspection_status == "goedgekeurd",
+                or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None)),
+                validity_days.isnot(None),
+            )
+            .values(laatste_keuring=Material.purchase_date)
+            .execution_options(synchronize_session=False)
+        )
+
+        # PART 2b: verlopen op basis van laatste_keuring/purchase_date +
+        # keuring_geldigheid_dagen van het type
+        base_date = func.coalesce(Material.laatste_keuring, Material.purchase_date)
+        result = db.session.execute(
+            update(Material)
+            .where(
+                Material.material_type_id.isnot(None),
+                Material.inspection_status == "goedgekeurd",
+                or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None)),
+                base_date.isnot(None),
+                # date + integer = date in Postgres
+                base_date + validity_days < today,
+            )
+            .values(inspection_status="keuring verlopen")
+            .execution_options(synchronize_session=False)
+        )
+        updated_count += result.rowcount or 0
+
         # NOTE: We do NOT commit here - let the caller handle transaction boundaries
         # This prevents issues where this function is called within a larger transaction
         # (e.g., during material creation) and would commit prematurely or interfere
@@ -235,10 +218,13 @@ class MaterialService:
     @staticmethod
     def is_material_in_use(material_id: int) -> bool:
         """Check if material is currently in use"""
-        return MaterialUsage.query.filter_by(
-            material_id=material_id,
-            is_active=True
-        ).count() > 0
+        # EXISTS stopt bij de eerste match; count(*) telt alle rijen door
+        return db.session.query(
+            MaterialUsage.query.filter_by(
+                material_id=material_id,
+                is_active=True
+            ).exists()
+        ).scalar()
     
     @staticmethod
     def get_active_usage(material_id: int) -> Optional[MaterialUsage]:
@@ -276,12 +262,7 @@ class MaterialService:
         2. Werf_id (if no active usage)
         3. Otherwise "niet in gebruik"
         """
-        active_count = MaterialUsage.query.filter_by(
-            material_id=material.id,
-            is_active=True
-        ).count()
-        
-        if active_count > 0:
+        if MaterialService.is_material_in_use(material.id):
             material.status = "in gebruik"
         else:
             # Fallback to werf_id-based calculation
@@ -308,7 +289,8 @@ class MaterialUsageService:
         if existing:
             # Deze error message wordt getoond wanneer materiaal al in gebruik is
             error_msg = "Materiaal al in gebruik"
-            print(f"DEBUG: Material {material.id} ({material.serial or material.name}) is already in use, raising: {error_msg}")
+            _log.debug("Material %s (%s) is already in use, raising: %s",
+                       material.id, material.serial or material.name, error_msg)
             raise ValueError(error_msg)
         
         # Create usage record
@@ -363,13 +345,8 @@ class MaterialUsageService:
                 material.assigned_to = None
                 material.site = None
             
-            # Check if other active usages exist
-            other_active = MaterialUsage.query.filter_by(
-                material_id=material.id,
-                is_active=True
-            ).count()
-            
-            if other_active == 0:
+            # Check if other active usages exist (EXISTS i.p.v. count)
+            if not MaterialService.is_material_in_use(material.id):
                 material.status = "niet in gebruik"
         
         db.session.commit()
@@ -402,7 +379,7 @@ class MaterialUsageService:
             raise ValueError("Material not found")
         
         # Update usage and material
-        usage.project_id = project_id  # project_id is alias voor werf_id via property
+        usage.project_id = project_id  # kolom "werf_id" in materiaal_gebruik
         usage.site = project.name
         material.werf_id = project_id
         material.site = project.name
@@ -413,22 +390,16 @@ class MaterialUsageService:
 
 class ActivityService:
     """Service for activity-related business logic and filtering"""
-    
+
     @staticmethod
-    def get_activities_filtered(
-        filter_type: str = "all",
-        filter_user: str = "",
-        filter_period: str = "all",
-        search_q: str = "",
-        limit: Optional[int] = 500
-    ) -> tuple[list[Activity], dict]:
+    def _apply_filters(query, filter_user: str = "", filter_period: str = "all", search_q: str = ""):
         """
-        Get filtered activities using ORM queries.
-        Returns (activities_list, counts_dict)
+        Pas de gedeelde periode/gebruiker/zoek-filters toe op een query.
+        Gedeeld tussen de geschiedenis-pagina en de CSV-export zodat de
+        filterlogica maar één keer bestaat.
         """
         today = datetime.utcnow().date()
-        query = Activity.query
-        
+
         # Filter by period using ORM (gebruik aangemaakt_op in plaats van created_at)
         if filter_period == "today":
             start_date = datetime.combine(today, datetime.min.time())
@@ -439,11 +410,11 @@ class ActivityService:
         elif filter_period == "month":
             start_date = datetime.combine(today - timedelta(days=30), datetime.min.time())
             query = query.filter(Activity.aangemaakt_op >= start_date)
-        
+
         # Filter by user using ORM (gebruik gebruiker_naam in plaats van user_name)
         if filter_user:
             query = query.filter(Activity.user_name.ilike(f"%{filter_user}%"))  # user_name is alias voor gebruiker_naam
-        
+
         # Filter by search query using ORM
         if search_q:
             query = query.filter(
@@ -453,56 +424,128 @@ class ActivityService:
                     Activity.action.ilike(f"%{search_q}%"),  # action is alias voor actie
                 )
             )
-        
-        # Count by category using ORM subqueries (more efficient than Python loops)
-        materiaal_query = query.filter(
-            or_(
+        return query
+
+    @staticmethod
+    def _category_condition(filter_type: str):
+        """SQL-conditie voor een activiteiten-categorie, of None voor 'all'."""
+        if filter_type == "materiaal":
+            return or_(
                 Activity.action.ilike("%toegevoegd%"),
                 Activity.action.ilike("%bewerkt%"),
                 Activity.action.ilike("%verwijderd%"),
             )
-        )
-        gebruik_query = query.filter(
-            or_(
+        if filter_type == "gebruik":
+            return or_(
                 Activity.action.ilike("%in gebruik%"),
                 Activity.action.ilike("%verplaatst%"),
                 Activity.action.ilike("%gekoppeld%"),
             )
+        if filter_type == "keuring":
+            return Activity.action.ilike("%keuring%")
+        return None
+
+    @staticmethod
+    def get_activities_filtered(
+        filter_type: str = "all",
+        filter_user: str = "",
+        filter_period: str = "all",
+        search_q: str = "",
+        limit: Optional[int] = 500
+    ) -> tuple[list, dict]:
+        """
+        Get filtered activities using ORM queries.
+        Returns (activities_list, counts_dict)
+
+        De pagina toont alleen datum, actie, naam, serienummer en gebruiker;
+        we selecteren daarom die kolommen als lichte rijen in plaats van
+        volledige Activity-objecten (geen ORM-constructie en geen
+        selectin-load van de user-relatie voor honderden rijen).
+        """
+        query = ActivityService._apply_filters(
+            db.session.query(
+                Activity.aangemaakt_op.label("created_at"),
+                Activity.action,
+                Activity.name,
+                Activity.serial,
+                Activity.user_name,
+            ),
+            filter_user=filter_user,
+            filter_period=filter_period, search_q=search_q,
         )
-        keuring_query = query.filter(Activity.action.ilike("%keuring%"))
-        
-        # Get counts
-        materiaal_count = materiaal_query.count()
-        gebruik_count = gebruik_query.count()
-        keuring_count = keuring_query.count()
-        
+
+        # Alle vier de tellers in één query met conditionele aggregatie
+        # (count over een CASE per categorie) in plaats van vier aparte
+        # count(*)-round-trips over dezelfde gefilterde tabel
+        counts_row = query.with_entities(
+            func.count().label("all"),
+            func.count(
+                case((ActivityService._category_condition("materiaal"), 1))
+            ).label("materiaal"),
+            func.count(
+                case((ActivityService._category_condition("gebruik"), 1))
+            ).label("gebruik"),
+            func.count(
+                case((ActivityService._category_condition("keuring"), 1))
+            ).label("keuring"),
+        ).one()
+
         # Filter by type if specified, then apply limit
-        if filter_type == "materiaal":
-            display_query = materiaal_query.order_by(Activity.aangemaakt_op.desc())
-        elif filter_type == "gebruik":
-            display_query = gebruik_query.order_by(Activity.aangemaakt_op.desc())
-        elif filter_type == "keuring":
-            display_query = keuring_query.order_by(Activity.aangemaakt_op.desc())
-        else:
-            display_query = query.order_by(Activity.aangemaakt_op.desc())
-        
-        # Apply limit if specified
+        category_condition = ActivityService._category_condition(filter_type)
+        display_query = query
+        if category_condition is not None:
+            display_query = display_query.filter(category_condition)
+        display_query = display_query.order_by(Activity.aangemaakt_op.desc())
+
         if limit:
             display_activities = display_query.limit(limit).all()
-            all_activities = query.order_by(Activity.aangemaakt_op.desc()).limit(limit).all()
         else:
             display_activities = display_query.all()
-            all_activities = query.order_by(Activity.aangemaakt_op.desc()).all()
-        
+
+        all_count = counts_row.all or 0
+        if limit:
+            # Zelfde semantiek als voorheen (len van de gelimiteerde lijst)
+            all_count = min(all_count, limit)
+
         counts = {
-            "all": len(all_activities),
-            "materiaal": materiaal_count,
-            "gebruik": gebruik_count,
-            "keuring": keuring_count,
+            "all": all_count,
+            "materiaal": counts_row.materiaal or 0,
+            "gebruik": counts_row.gebruik or 0,
+            "keuring": counts_row.keuring or 0,
         }
-        
+
         return display_activities, counts
-    
+
+    @staticmethod
+    def iter_export_rows(
+        filter_type: str = "all",
+        filter_user: str = "",
+        filter_period: str = "all",
+        search_q: str = "",
+        batch_size: int = 1000,
+    ):
+        """
+        Stream slanke kolom-rijen voor de CSV-export via een server-side
+        cursor (yield_per): geheugen blijft O(batch) in plaats van O(N)
+        en er is geen ORM-instrumentatie per rij.
+        """
+        query = ActivityService._apply_filters(
+            db.session.query(
+                Activity.aangemaakt_op,
+                Activity.action,
+                Activity.name,
+                Activity.serial,
+                Activity.user_name,
+            ),
+            filter_user=filter_user,
+            filter_period=filter_period,
+            search_q=search_q,
+        )
+        condition = ActivityService._category_condition(filter_type)
+        if condition is not None:
+            query = query.filter(condition)
+        return query.order_by(Activity.aangemaakt_op.desc()).yield_per(batch_size)
+
     @staticmethod
     def get_unique_users() -> list[str]:
         """
@@ -618,43 +661,40 @@ class KeuringService:
             or_(Material.is_deleted.is_(False), Material.is_deleted.is_(None))  # Exclude soft-deleted materials
         )
         
-        # 1. Te laat: Count items where inspection_status exactly equals "keuring verlopen"
-        te_laat_count = (
-            db.session.query(Material)
-            .filter(base_filter)
-            .filter(Material.inspection_status == "keuring verlopen")
-            .count()
-        )
-        
-        # 2. Te keuren vandaag: Items with volgende_controle == today
-        # Must have a volgende_controle date (no NULL dates count)
-        vandaag_count = (
-            db.session.query(Material)
-            .outerjoin(Keuringstatus, Material.keuring_id == Keuringstatus.id)
-            .filter(base_filter)
-            .filter(Keuringstatus.volgende_controle.isnot(None))
-            .filter(Keuringstatus.volgende_controle == today)
-            .distinct()
-            .count()
-        )
-        
-        # 3. Binnen 30 dagen: Items with volgende_controle between tomorrow and today+30 days (inclusive)
-        # date > today AND date <= today + 30 days
-        binnen_30_dagen_count = (
-            db.session.query(Material)
+        # De drie tellers verschillen alleen in hun predicaat; met
+        # conditionele aggregatie (count over een CASE) komen ze uit één
+        # query over dezelfde join in plaats van drie aparte scans.
+        # count(CASE ...) telt niet-NULL waarden, dus rijen zonder
+        # volgende_controle vallen er vanzelf buiten.
+        deadline = today + relativedelta(days=30)
+        row = (
+            db.session.query(
+                func.count(
+                    case((Material.inspection_status == "keuring verlopen", 1))
+                ).label("te_laat"),
+                func.count(
+                    case((Keuringstatus.volgende_controle == today, 1))
+                ).label("vandaag"),
+                func.count(
+                    case((
+                        and_(
+                            Keuringstatus.volgende_controle > today,
+                            Keuringstatus.volgende_controle <= deadline,
+                        ),
+                        1,
+                    ))
+                ).label("binnen_30_dagen"),
+            )
+            .select_from(Material)
             .outerjoin(Keuringstatus, Material.keuring_id == Keuringstatus.id)
             .filter(base_filter)
-            .filter(Keuringstatus.volgende_controle.isnot(None))
-            .filter(Keuringstatus.volgende_controle > today)
-            .filter(Keuringstatus.volgende_controle <= (today + relativedelta(days=30)))
-            .distinct()
-            .count()
+            .one()
         )
-        
+
         return {
-            "te_laat": te_laat_count,
-            "vandaag": vandaag_count,
-            "binnen_30_dagen": binnen_30_dagen_count
+            "te_laat": row.te_laat or 0,
+            "vandaag": row.vandaag or 0,
+            "binnen_30_dagen": row.binnen_30_dagen or 0,
         }
     
     @staticmethod
@@ -867,7 +907,31 @@ class KeuringService:
             for usage in usage_records:
                 if usage.material_id not in active_usages:
                     active_usages[usage.material_id] = usage
-        
+
+        # Pre-fetch het recentste certificaat-pad per materiaal in één query
+        # (window function) in plaats van een .first() per rij in de loop
+        latest_cert_paths = {}
+        if material_ids:
+            rn = func.row_number().over(
+                partition_by=KeuringHistoriek.material_id,
+                order_by=KeuringHistoriek.keuring_datum.desc(),
+            ).label("rn")
+            historiek_sub = (
+                db.session.query(
+                    KeuringHistoriek.material_id.label("material_id"),
+                    KeuringHistoriek.certificaat_path.label("certificaat_path"),
+                    rn,
+                )
+                .filter(KeuringHistoriek.material_id.in_(material_ids))
+                .subquery()
+            )
+            latest_cert_paths = {
+                row.material_id: row.certificaat_path
+                for row in db.session.query(
+                    historiek_sub.c.material_id, historiek_sub.c.certificaat_path
+                ).filter(historiek_sub.c.rn == 1)
+            }
+
         # Build inspection list with computed status and risk
         # NIEUWE LOGICA: Direct mapping van Material naar keuringentabel
         inspection_list = []
@@ -897,16 +961,14 @@ class KeuringService:
             # Volgende keuring is altijd leeg volgens nieuwe logica (geen automatische berekening)
             # dagen_verschil blijft None
             
-            # Check certificate
+            # Check certificate (uit de gebatchte lookup hierboven)
             has_certificate = False
             certificaat_url = None
-            latest_history = KeuringHistoriek.query.filter_by(
-                material_id=material.id
-            ).order_by(KeuringHistoriek.keuring_datum.desc()).first()
-            if latest_history and latest_history.certificaat_path:
+            certificaat_path = latest_cert_paths.get(material.id)
+            if certificaat_path:
                 has_certificate = True
                 from helpers import get_document_url
-                certificaat_url = get_document_url("Keuringstatus", latest_history.certificaat_path)
+                certificaat_url = get_document_url("Keuringstatus", certificaat_path)
             
             # Calculate risk using algorithm
             risk_data = calculate_inspection_risk(material, keuring, today)
@@ -1181,7 +1243,7 @@ def ensure_keuring_status_and_historiek_for_new_material(
             # Bepaal uitgevoerd_door: gebruik gebruikersnaam als beschikbaar, anders "Onbekend"
             uitgevoerd_door = "Onbekend"
             if user_id:
-                user = Gebruiker.query.get(user_id)
+                user = db.session.get(Gebruiker, user_id)
                 if user and user.naam:
                     uitgevoerd_door = user.naam
             